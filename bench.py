@@ -0,0 +1,313 @@
+"""
+Benchmark de frame-time: escenarios fijos (seed + reloj simulado) sobre las
+clases reales del juego. Mide update y render por separado (ms/frame) con
+p50/p95/p99 y puede compararse contra un baseline JSON guardado.
+
+    python bench.py                          # imprime tabla + JSON en bench_results.json
+    python bench.py --save-baseline base.json
+    python bench.py --baseline base.json     # exit 1 si algún escenario empeora
+    python bench.py --replays replays/       # re-simula partidas .frrp (exit 1 si alguna diverge)
+    python bench.py --memory                 # + alocaciones/Surfaces por frame (tracemalloc: tiempos no comparables)
+    python bench.py --startup 5              # arranque en frío hasta el menú (exit 1 si supera el presupuesto)
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import glob
+import subprocess
+from array import array
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import game as g
+
+# ================================
+# ESCENARIOS
+# ================================
+def _play(game, level, rows=None):
+    ps = g.PlayState(game)
+    ps.lives = 10**6          # nadie muere durante el benchmark
+    ps.level = level
+    ps._setup_level()
+    if rows is not None and ps.enemy_grid is not None:
+        ps.enemy_grid.rows = rows
+        ps.enemy_grid._build_grid()
+        ps.enemy_grid.assign_shooters(level)
+    return ps
+
+# Cada escenario devuelve (estado, teclas mantenidas, hook por frame o None).
+def scenario_level1(game):
+    ps = _play(game, 1)
+    assert isinstance(ps.enemy_grid.movement_strategy, g.HorizontalBounceStrategy)
+    return ps, {pygame.K_SPACE}, None
+
+def scenario_level6_zigzag(game):
+    ps = _play(game, 6, rows=6)
+    assert isinstance(ps.enemy_grid.movement_strategy, g.ZigZagBounceStrategy)
+    return ps, {pygame.K_SPACE}, None
+
+BOSS_SCENARIO_BULLETS = 300
+
+def scenario_boss_bullet_hell(game):
+    ps = _play(game, g.BOSS_EVERY_N_LEVELS)
+    ps.boss.hp = ps.boss.max_hp = 10**6
+    rng = random.Random(5)
+    def refill():
+        # mantiene la pantalla llena: repone las balas que salieron/chocaron, siempre dentro
+        # de la zona que el juego conserva (arriba de y=0 se descartan en el primer update)
+        while len(ps.enemy_bullets) < BOSS_SCENARIO_BULLETS:
+            y = rng.randint(0, g.HEIGHT - 100)
+            ps.factory.create_enemy_bullet(rng.randint(0, g.WIDTH), y, g.BOSS_BULLET_SPEED, g.COLOR_BOSS_BULLET)
+    refill()
+    return ps, {pygame.K_SPACE}, refill
+
+def scenario_max_powerups(game):
+    ps = _play(game, 2)
+    ps.max_bullets = g.MAX_BULLETS_CAP
+    ps.shot_count = g.SHOT_COUNT_MAX
+    ps.fire_cooldown_ms = g.MIN_FIRE_COOLDOWN_MS
+    return ps, {pygame.K_SPACE}, None
+
+def scenario_menu_crt(game):
+    game.crt_on = True
+    return g.MenuState(game), set(), None
+
+def scenario_powerup_menu_crt(game):
+    game.crt_on = True
+    return g.PowerUpChoiceState(game, _play(game, 2)), set(), None
+
+SCENARIOS = {
+    "level1_horizontal":  scenario_level1,
+    "level6_zigzag_6rows": scenario_level6_zigzag,
+    "boss_bullet_hell":   scenario_boss_bullet_hell,
+    "max_powerups":       scenario_max_powerups,
+    "menu_crt":           scenario_menu_crt,
+    "powerup_menu_crt":   scenario_powerup_menu_crt,
+}
+
+# ================================
+# MEDICIÓN
+# ================================
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    s = sorted(samples)
+    k = (len(s) - 1) * pct / 100.0
+    lo = int(k); hi = min(lo + 1, len(s) - 1)
+    return s[lo] + (s[hi] - s[lo]) * (k - lo)
+
+def summarize(samples):
+    return {
+        "mean": sum(samples) / max(1, len(samples)),
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+        "max": max(samples) if samples else 0.0,
+    }
+
+def run_scenario(name, frames=600, warmup=60, seed=1234):
+    random.seed(seed)
+    clock_src = g.FrameClock()
+    keys = g.ScriptedInput()
+    prev_clock, prev_input = g.use_clock(clock_src), g.use_input(keys)
+    try:
+        screen = g.BOOT.display(headless=True)   # ventana primero: los sprites se convierten a su formato como en el juego
+        game = g.Game(headless=True)
+        state, held, hook = SCENARIOS[name](game)
+        game.change_state(state)
+        keys.set(held)
+        level0 = getattr(state, "level", None)
+        # arrays pre-dimensionados: medir no debe sumar objetos vivos al conteo de bloques
+        upd, ren = array("d", bytes(8 * frames)), array("d", bytes(8 * frames))
+        blocks0 = None
+        for i in range(warmup + frames):
+            if i == warmup:
+                g.GC.reset_stats()
+                g.MEMORY.reset()
+                blocks0 = sys.getallocatedblocks()
+            if hook is not None:
+                hook()
+            if i >= warmup:
+                g.MEMORY.begin_frame(state)
+            t0 = time.perf_counter()
+            state.update()
+            t1 = time.perf_counter()
+            game.render(screen)
+            t2 = time.perf_counter()
+            g.MEMORY.end_frame()
+            clock_src.tick()
+            # el escenario es fijo: si el juego cambió de estado/nivel, se vuelve a armar
+            if game.state is not state or getattr(state, "level", None) != level0:
+                state, held, hook = SCENARIOS[name](game)
+                game.change_state(state)
+            if i >= warmup:
+                upd[i - warmup] = (t1 - t0) * 1000.0
+                ren[i - warmup] = (t2 - t1) * 1000.0
+        blocks = sys.getallocatedblocks() - blocks0
+    finally:
+        g.use_clock(prev_clock); g.use_input(prev_input)
+    play = getattr(state, "play_state", state)
+    factory = getattr(play, "factory", None)
+    res = {
+        "frames": frames,
+        "update_ms": summarize(upd),
+        "render_ms": summarize(ren),
+        # bloques vivos netos por frame (≈0 en régimen estable = el loop no acumula objetos)
+        "alloc_blocks_per_frame": blocks / max(1, frames),
+        "gc": g.GC.stats(),
+        "pools": factory.pool_stats() if factory else {},
+    }
+    if g.MEMORY.enabled:
+        res["memory"] = g.MEMORY.report(game, top=10)
+    return res
+
+def bench_crt(frames=300):
+    """ms por aplicación de cada implementación CRT sobre un frame completo (incluida la original, "legacy")."""
+    screen = g.BOOT.display(headless=True)
+    out = {}
+    for mode in g.CRT_MODES:
+        crt = g.make_crt(mode)
+        crt.apply(screen)   # construye/cachea la máscara fuera de la medición
+        samples = array("d", bytes(8 * frames))
+        for i in range(frames):
+            t0 = time.perf_counter()
+            crt.apply(screen)
+            samples[i] = (time.perf_counter() - t0) * 1000.0
+        out[mode] = dict(summarize(samples), size=screen.get_size())
+    return out
+
+def bench_replays(paths):
+    """Re-simula replays grabados (headless): verifica que reproduzcan el resultado y mide frames/s."""
+    out = {"sessions": 0, "frames": 0, "mismatches": []}
+    t0 = time.perf_counter()
+    for path in paths:
+        rep = g.Replay.load(path)
+        ps = g.play_replay(rep)
+        out["sessions"] += 1
+        out["frames"] += rep.frame_count
+        if rep.result is not None and not rep.matches(ps):
+            out["mismatches"].append(path)
+    dt = time.perf_counter() - t0
+    out["seconds"] = dt
+    out["frames_per_s"] = out["frames"] / dt if dt else 0.0
+    return out
+
+STARTUP_SCRIPT = ("import json, game; gm = game.Game(); gm.present(); "
+                  "print(json.dumps(game.BOOT.report())); gm.profiles.close()")
+
+def bench_startup(runs=5):
+    """Arranque en frío (proceso nuevo: import → Game() → primer frame del menú); mediana por etapa."""
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+    root = os.path.dirname(os.path.abspath(__file__))
+    reports = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=root, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        reports.append(json.loads(out.strip().splitlines()[-1]))
+    stages = sorted({k for r in reports for k, v in r.items() if isinstance(v, float)})
+    res = {k: percentile([r[k] for r in reports if k in r], 50) for k in stages}
+    res["budget_ms"] = reports[0]["budget_ms"]
+    res["over_budget"] = res.get("first_frame", 0.0) > res["budget_ms"]
+    return res
+
+def compare(results, baseline, tolerance):
+    """Devuelve lista de regresiones (p95 de update/render por encima de baseline * (1 + tolerance))."""
+    regressions = []
+    for name, res in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for phase in ("update_ms", "render_ms"):
+            cur, ref = res[phase]["p95"], base[phase]["p95"]
+            if ref > 0 and cur > ref * (1.0 + tolerance):
+                regressions.append((name, phase, ref, cur))
+    for mode, res in results.get("crt", {}).items():
+        base = baseline.get("crt", {}).get(mode)
+        if base and base["p95"] > 0 and res["p95"] > base["p95"] * (1.0 + tolerance):
+            regressions.append(("crt_" + mode, "apply_ms", base["p95"], res["p95"]))
+    return regressions
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--frames", type=int, default=600)
+    ap.add_argument("--warmup", type=int, default=60)
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--only", nargs="*", choices=sorted(SCENARIOS), help="subconjunto de escenarios")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--baseline", help="JSON previo contra el que comparar")
+    ap.add_argument("--save-baseline", help="guardar resultados como baseline")
+    ap.add_argument("--crt-mode", choices=sorted(g.CRT_MODES), help="implementación CRT para los escenarios")
+    ap.add_argument("--skip-crt", action="store_true", help="no medir las implementaciones CRT")
+    ap.add_argument("--replays", nargs="+", help="archivos .frrp o directorios a re-simular")
+    ap.add_argument("--memory", action="store_true", help="medir memoria por frame con tracemalloc (más lento)")
+    ap.add_argument("--startup", type=int, metavar="N", help="medir N arranques en frío")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="margen de regresión (0.15 = +15%%)")
+    args = ap.parse_args(argv)
+
+    if args.replays:
+        paths = []
+        for p in args.replays:
+            paths.extend(sorted(glob.glob(os.path.join(p, "*.frrp"))) if os.path.isdir(p) else [p])
+        res = bench_replays(paths)
+        print(f"replays {res['sessions']} sesiones, {res['frames']} frames en {res['seconds']:.2f} s "
+              f"({res['frames_per_s']:.0f} frames/s), {len(res['mismatches'])} divergentes")
+        for path in res["mismatches"]:
+            print(f"DIVERGE {path}")
+        return 1 if res["mismatches"] else 0
+
+    if args.startup:
+        res = bench_startup(args.startup)
+        print("arranque (mediana): " + ", ".join(f"{k} {v:.1f} ms" for k, v in res.items() if isinstance(v, float)))
+        if res["over_budget"]:
+            print(f"SOBRE PRESUPUESTO: primer frame {res['first_frame']:.1f} ms > {res['budget_ms']} ms")
+        return 1 if res["over_budget"] else 0
+
+    if args.crt_mode:
+        g.CRT_MODE = args.crt_mode
+    if args.memory:
+        g.MEMORY.start()
+    results = {"frames": args.frames, "seed": args.seed, "crt_mode": g.CRT_MODE, "scenarios": {}}
+    for name in (args.only or SCENARIOS):
+        res = run_scenario(name, args.frames, args.warmup, args.seed)
+        results["scenarios"][name] = res
+        u, r = res["update_ms"], res["render_ms"]
+        print(f"{name:22s} update p50 {u['p50']:.3f}  p95 {u['p95']:.3f}  p99 {u['p99']:.3f} | "
+              f"render p50 {r['p50']:.3f}  p95 {r['p95']:.3f}  p99 {r['p99']:.3f}  (ms)")
+        gcs = res["gc"]
+        print(f"{'':22s} alloc {res['alloc_blocks_per_frame']:+.2f} blocks/frame | "
+              f"gc {gcs['collections']} pause total {gcs['pause_ms_total']:.2f} ms, max {gcs['pause_ms_max']:.2f} ms")
+        for state, m in res.get("memory", {}).get("states", {}).items():
+            print(f"{'':22s} mem {state}: {m['traced_kib_per_frame']:+.3f} KiB/frame, pico {m['peak_kib_per_frame']:.1f} KiB, "
+                  f"{m['surfaces_per_frame']:.2f} surfaces ({m['surface_kib_per_frame']:.1f} KiB)/frame")
+
+    if not args.skip_crt:
+        results["crt"] = bench_crt()
+        legacy = results["crt"]["legacy"]["p50"]
+        for mode, res in results["crt"].items():
+            speedup = legacy / res["p50"] if res["p50"] else float("inf")
+            w, h = res["size"]
+            print(f"crt {mode:10s} apply p50 {res['p50']:.3f}  p95 {res['p95']:.3f} ms  (x{speedup:.1f} vs legacy, {w}x{h})")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, phase, ref, cur in regressions:
+            print(f"REGRESIÓN {name} {phase}: p95 {ref:.3f} -> {cur:.3f} ms")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
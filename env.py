@@ -0,0 +1,358 @@
+"""
+Entorno estilo gym para bots: PlayState headless (sin render ni audio, reloj
+simulado), observación compacta en arrays numpy de forma fija y recompensa =
+delta de score. VecEnv corre N entornos independientes repartidos en
+procesos: observaciones, acciones y resultados viven en un bloque de memoria
+compartida y por el pipe sólo viaja un byte de orden por proceso y paso.
+Requiere numpy.
+
+    python env.py                                # bot al azar: 8 entornos, 2000 pasos
+    python env.py --envs 32 --workers 8 --steps 5000 --seed 7
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import multiprocessing as mp
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+import game as g
+
+# ================================
+# OBSERVACIÓN
+# ================================
+# acción -> teclas mantenidas durante el paso
+ACTIONS = (
+    frozenset(),                                   # 0 quieto
+    frozenset({pygame.K_LEFT}),                    # 1 izquierda
+    frozenset({pygame.K_RIGHT}),                   # 2 derecha
+    frozenset({pygame.K_SPACE}),                   # 3 disparar
+    frozenset({pygame.K_LEFT, pygame.K_SPACE}),    # 4 izquierda + disparar
+    frozenset({pygame.K_RIGHT, pygame.K_SPACE}),   # 5 derecha + disparar
+)
+
+MAX_ROWS = 6              # tope de filas de create_enemy_grid
+MAX_BULLETS = 16          # balas del jugador en la observación (las demás se cortan)
+MAX_ENEMY_BULLETS = 128   # balas enemigas/boss en la observación
+
+# nombre -> (forma, dtype). Las balas son centros (x, y); n_* dice cuántas filas valen
+# (la cantidad real, aunque supere el tope). Sin grilla (boss) la máscara y los límites van en 0.
+OBS_SPEC = {
+    "player_x":        ((), np.int16),
+    "enemy_mask":      ((MAX_ROWS, g.ENEMY_COLS), np.uint8),   # 1 = vivo, en orden de grilla
+    "enemy_bounds":    ((4,), np.int16),                       # left, top, right, bottom
+    "bullets":         ((MAX_BULLETS, 2), np.int16),
+    "n_bullets":       ((), np.int16),
+    "enemy_bullets":   ((MAX_ENEMY_BULLETS, 2), np.int16),
+    "n_enemy_bullets": ((), np.int16),
+    "boss_hp":         ((), np.int32),
+    "lives":           ((), np.int16),
+    "level":           ((), np.int16),
+}
+
+# resultados por entorno que VecEnv deja junto a las observaciones
+STEP_SPEC = {
+    "action":    ((), np.uint8),
+    "reward":    ((), np.int32),
+    "done":      ((), np.bool_),
+    "truncated": ((), np.bool_),
+    "score":     ((), np.int64),
+    "steps":     ((), np.int32),
+}
+
+def _layout(n, buffer=None):
+    """
+    Arrays (n, ...) de OBS_SPEC (obs y terminal_obs) y STEP_SPEC sobre un
+    solo buffer (memoria compartida) o uno propio. Devuelve (arrays, bytes).
+    """
+    fields = ([("obs", k, s, t) for k, (s, t) in OBS_SPEC.items()]
+              + [("terminal_obs", k, s, t) for k, (s, t) in OBS_SPEC.items()]
+              + [("step", k, s, t) for k, (s, t) in STEP_SPEC.items()])
+    offsets, size = [], 0
+    for _, _, shape, dtype in fields:
+        size = -(-size // 8) * 8   # alineado a 8
+        offsets.append(size)
+        size += n * int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+    if buffer is None:
+        buffer = bytearray(size)
+    out = {"obs": {}, "terminal_obs": {}, "step": {}}
+    for (group, name, shape, dtype), off in zip(fields, offsets):
+        count = n * int(np.prod(shape, dtype=np.int64))
+        out[group][name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=off).reshape((n,) + shape)
+    return out, size
+
+def _views(arrays, i):
+    """Vistas del entorno i (arr[i, ...]: también los escalares son vistas 0-d escribibles)."""
+    return {k: a[i, ...] for k, a in arrays.items()}
+
+def empty_obs():
+    return {k: np.zeros(s, dtype=t) for k, (s, t) in OBS_SPEC.items()}
+
+# ================================
+# ENTORNO
+# ================================
+class FrancoEnv:
+    """
+    Una partida headless. reset(seed) -> obs; step(action) -> (obs, reward,
+    done, info). done al llegar a GameOverState (o al cumplir max_steps, con
+    info["truncated"]). Las elecciones de power-up las resuelve `powerup`
+    ("cycle" = 0, 1, 2, ... o un índice fijo). Sin seed, las partidas salen
+    del RNG del entorno: el mismo `seed` de construcción repite la secuencia.
+
+    La observación (ver OBS_SPEC) se escribe en el lugar sobre los mismos
+    arrays en cada paso (`obs`, o los que se pasen: VecEnv les da vistas de
+    memoria compartida): copiarla si hay que guardarla.
+
+    Reloj, input, partículas y estela son globales del módulo: cada entorno
+    instala los suyos mientras avanza, así varios conviven en un proceso. El
+    GC no se separa: GC.settle() (en cada nivel) y sus estadísticas son del
+    proceso entero.
+    """
+    n_actions = len(ACTIONS)
+
+    def __init__(self, seed=None, frame_skip=1, max_steps=None, powerup="cycle", level=1, obs=None):
+        self.frame_skip = max(1, frame_skip)
+        self.max_steps = max_steps
+        self.powerup = powerup
+        self.level = level
+        self.obs = obs if obs is not None else empty_obs()
+        self._seeds = random.Random(seed)
+        self.clock = g.FrameClock(g.SIM_DT_MS)
+        self.keys = g.ScriptedInput()
+        self.particles = g.ParticleEngine(seed=seed)
+        self.trail = g.TrailEmitter(self.particles)
+        self.game = g.Game(headless=True, replay_dir="")
+        self.play = None
+        self.steps = 0
+        self._score = 0
+        self._choices = 0
+
+    def _enter(self):
+        prev = (g.use_clock(self.clock), g.use_input(self.keys), g.PARTICLES, g.BULLET_TRAIL)
+        g.PARTICLES, g.BULLET_TRAIL = self.particles, self.trail
+        return prev
+
+    def _leave(self, prev):
+        g.use_clock(prev[0]); g.use_input(prev[1])
+        g.PARTICLES, g.BULLET_TRAIL = prev[2], prev[3]
+
+    def reset(self, seed=None):
+        seed = seed if seed is not None else self._seeds.getrandbits(32)
+        prev = self._enter()
+        try:
+            self.keys.set(())
+            self.play = g.PlayState(self.game, seed=seed, level=self.level)
+            self.game.change_state(self.play)
+        finally:
+            self._leave(prev)
+        self.steps = 0
+        self._score = 0
+        self._choices = 0
+        return self.observe()
+
+    def step(self, action):
+        game, ps = self.game, self.play
+        self.keys.set(ACTIONS[action])
+        done = False
+        prev = self._enter()
+        try:
+            for _ in range(self.frame_skip):
+                if game.state is not ps:   # elección de power-up pendiente (como play_replay)
+                    choice = self._choices % 3 if self.powerup == "cycle" else self.powerup
+                    game.state.selection = choice
+                    game.state.apply_and_continue()
+                    self._choices += 1
+                ps.update()
+                self.clock.tick()
+                if isinstance(game.state, g.GameOverState):
+                    done = True
+                    break
+        finally:
+            self._leave(prev)
+        self.steps += 1
+        reward = ps.score - self._score
+        self._score = ps.score
+        info = {"score": ps.score, "lives": ps.lives, "level": ps.level, "steps": self.steps}
+        if not done and self.max_steps is not None and self.steps >= self.max_steps:
+            done = info["truncated"] = True
+        return self.observe(), reward, done, info
+
+    def observe(self):
+        ps, obs = self.play, self.obs
+        obs["player_x"][...] = ps.player.rect.centerx
+        grid, mask, bounds = ps.enemy_grid, obs["enemy_mask"], obs["enemy_bounds"]
+        mask[...] = 0
+        if grid is not None and ps.boss is None:
+            mask.reshape(-1)[[e.index for e in grid.live()]] = 1
+            b = grid.bounds
+            bounds[...] = (b.left, b.top, b.right, b.bottom)
+        else:
+            bounds[...] = 0
+        for key, store in (("bullets", ps.bullets), ("enemy_bullets", ps.enemy_bullets)):
+            pos = store.positions()
+            k = len(pos)
+            dst = obs[key]
+            m = min(k, len(dst))
+            dst[:m] = pos[:m]
+            dst[m:] = 0
+            obs["n_" + key][...] = k
+        obs["boss_hp"][...] = ps.boss.hp if ps.boss is not None else 0
+        obs["lives"][...] = ps.lives
+        obs["level"][...] = ps.level
+        return obs
+
+# ================================
+# VECTORIZADO
+# ================================
+def _step_batch(envs, arrays, lo):
+    """Avanza los entornos lo.. con las acciones de `arrays`; los terminados se reinician solos."""
+    st, term = arrays["step"], arrays["terminal_obs"]
+    for j, env in enumerate(envs):
+        i = lo + j
+        _, reward, done, info = env.step(int(st["action"][i]))
+        st["reward"][i] = reward
+        st["done"][i] = done
+        st["truncated"][i] = info.get("truncated", False)
+        st["score"][i] = info["score"]
+        st["steps"][i] = info["steps"]
+        if done:
+            for k, a in term.items():
+                a[i] = env.obs[k]
+            env.reset()
+
+def _worker(conn, raw, n_envs, lo, hi, seeds, env_kwargs):
+    arrays, _ = _layout(n_envs, raw)
+    envs = [FrancoEnv(seed=s, obs=_views(arrays["obs"], i), **env_kwargs) for i, s in zip(range(lo, hi), seeds)]
+    try:
+        while True:
+            cmd = conn.recv_bytes()
+            if cmd == b"s":
+                _step_batch(envs, arrays, lo)
+            elif cmd == b"r":
+                for env in envs:
+                    env.reset()
+            else:
+                break
+            conn.send_bytes(b"k")
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        conn.close()
+
+class VecEnv:
+    """
+    N FrancoEnv independientes (semillas seed, seed + 1, ...) repartidos en
+    `workers` procesos; workers=0 los corre en este proceso.
+    step(actions) -> (obs, rewards, dones, infos): obs es un dict de arrays
+    (N, ...) según OBS_SPEC; infos, arrays (N,) de score, steps y truncated
+    más "terminal_obs" (la última obs de los que terminaron; ya se
+    reiniciaron y su fila de obs es la inicial de la partida nueva). Todo son
+    vistas de la memoria compartida que el paso siguiente pisa.
+    """
+    def __init__(self, n_envs, workers=None, seed=0, context=None, **env_kwargs):
+        self.n_envs = n_envs
+        seeds = [seed + i for i in range(n_envs)]
+        workers = min(n_envs, os.cpu_count() or 1) if workers is None else min(workers, n_envs)
+        self._local = None
+        self._conns, self._procs = [], []
+        if workers <= 0:
+            self.arrays, _ = _layout(n_envs)
+            self._local = [FrancoEnv(seed=s, obs=_views(self.arrays["obs"], i), **env_kwargs)
+                           for i, s in enumerate(seeds)]
+            return
+        ctx = mp.get_context(context)
+        _, size = _layout(n_envs)
+        self._raw = ctx.RawArray("B", size)
+        self.arrays, _ = _layout(n_envs, self._raw)
+        per, extra = divmod(n_envs, workers)
+        lo = 0
+        for w in range(workers):
+            hi = lo + per + (1 if w < extra else 0)
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_worker, args=(child, self._raw, n_envs, lo, hi, seeds[lo:hi], env_kwargs),
+                               daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+            lo = hi
+
+    def _broadcast(self, cmd):
+        for conn in self._conns:
+            conn.send_bytes(cmd)
+        for conn in self._conns:
+            conn.recv_bytes()
+
+    def reset(self):
+        if self._local is not None:
+            for env in self._local:
+                env.reset()
+        else:
+            self._broadcast(b"r")
+        return self.arrays["obs"]
+
+    def step(self, actions):
+        st = self.arrays["step"]
+        st["action"][:] = actions
+        if self._local is not None:
+            _step_batch(self._local, self.arrays, 0)
+        else:
+            self._broadcast(b"s")
+        infos = {"score": st["score"], "steps": st["steps"], "truncated": st["truncated"],
+                 "terminal_obs": self.arrays["terminal_obs"]}
+        return self.arrays["obs"], st["reward"], st["done"], infos
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send_bytes(b"q")
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+        self._conns, self._procs = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ================================
+# BOT AL AZAR (smoke de dificultad y rendimiento)
+# ================================
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--envs", type=int, default=8)
+    ap.add_argument("--workers", type=int, default=None, help="procesos (0 = en este proceso; default: CPUs)")
+    ap.add_argument("--steps", type=int, default=2000, help="pasos por entorno")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--frame-skip", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    episodes, score_sum, levels = 0, 0, []
+    with VecEnv(args.envs, args.workers, args.seed, frame_skip=args.frame_skip) as venv:
+        venv.reset()
+        t0 = time.perf_counter()
+        for _ in range(args.steps):
+            _, _, dones, infos = venv.step(rng.integers(0, FrancoEnv.n_actions, args.envs))
+            if dones.any():
+                episodes += int(dones.sum())
+                score_sum += int(infos["score"][dones].sum())
+                levels.extend(infos["terminal_obs"]["level"][dones].tolist())
+        dt = time.perf_counter() - t0
+    total = args.envs * args.steps
+    print(f"{total} pasos en {dt:.2f} s ({total / dt:.0f} pasos/s, {total * args.frame_skip / dt:.0f} frames/s)")
+    if episodes:
+        print(f"{episodes} partidas: score medio {score_sum / episodes:.0f}, nivel medio {sum(levels) / episodes:.1f}, "
+              f"nivel máx {max(levels)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
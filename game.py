@@ -1,24 +1,52 @@
+import time
+_T_IMPORT = time.perf_counter()   # reporte de arranque: el import se mide desde acá
 import pygame
 import sys
 import math
 import os
 import json
+import struct
 import string
 import random  # sfx variants, selection, shake
+import gc
+import types
+import heapq
+import itertools
+import tracemalloc
+import threading
+import atexit
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait as futures_wait
+
+try:
+    import numpy as np  # opcional: proyectiles vectorizados (sin numpy se usan objetos)
+except ImportError:
+    np = None
+try:
+    import sqlite3  # opcional: algunas builds de Python vienen sin él (los perfiles quedan en JSON)
+except ImportError:
+    sqlite3 = None
 
 # ================================
-# INICIALIZACIÓN (fix lag audio)
+# INICIALIZACIÓN (ver Bootstrap: importar no inicializa pygame)
 # ================================
-pygame.mixer.pre_init(22050, -16, 1, 512)  # 22.05 kHz, 16-bit, mono, buffer corto
-pygame.init()
+# Modo headless: sin ventana ni audio reales (drivers dummy de SDL)
+HEADLESS = os.environ.get("FRANCO_HEADLESS") == "1"
+MIXER_FORMAT = (22050, -16, 1)  # 22.05 kHz, 16-bit, mono (la caché de audio guarda muestras en este formato)
+MIXER_BUFFER = 512              # buffer corto (fix lag audio)
+STARTUP_REPORT = os.environ.get("FRANCO_STARTUP_REPORT") == "1"  # imprime los tiempos de arranque al primer frame
+STARTUP_BUDGET_MS = 1500        # import → primer frame del menú
 
 WIDTH, HEIGHT = 800, 600
-FPS = 60
+FPS = 60                  # pasos de simulación por segundo: las velocidades son px por paso
+SIM_DT_MS = 1000 / FPS
+MAX_CATCHUP_STEPS = 5     # pasos de lógica como máximo por frame dibujado; el atraso extra se descarta
+RENDER_FPS = int(os.environ.get("FRANCO_RENDER_FPS", str(FPS)))  # tope de frames dibujados (0 = sin tope)
+INTERP_MAX_JUMP = 48      # px: desplazamientos mayores en un paso (teletransportes) no se interpolan
 
 # --- Rutas/Assets ---
 BASE_DIR   = os.path.dirname(os.path.abspath(__file__))
 ASSETS_DIR = os.path.join(BASE_DIR, "assets")
-os.makedirs(ASSETS_DIR, exist_ok=True)
 
 # --- Player ---
 PLAYER_SPEED = 6
@@ -60,6 +88,7 @@ COLOR_ENEMY_BULLET_NORM  = (255, 255, 120)
 
 # --- FX ---
 EXPLOSION_MS = 220  # duración de la explosión
+COLOR_EXPLOSION = (255, 220, 160)
 
 # --- Daño del jugador (feedback) ---
 HURT_SHAKE_MS  = 260
@@ -75,6 +104,15 @@ MAX_LIVES = 5
 HEALTH_DROP_CHANCE = 0.06     # ~6% por enemigo eliminado
 HEALTH_DROP_SPEED  = 3.5
 
+# --- Fondo (starfield compartido) ---
+STAR_LAYERS  = ((80, 1), (50, 2), (25, 3))   # (cantidad, velocidad px/frame) por capa
+STAR_DENSITY = 1.0                           # multiplicador de cantidad de estrellas
+
+# --- Render ---
+DIRTY_RECTS = os.environ.get("FRANCO_DIRTY_RECTS") == "1"  # display.update(rects) en vez de flip()
+REPLAY_DIR = os.environ.get("FRANCO_REPLAY_DIR", "")  # si está, cada partida se graba ahí (.frrp)
+DISPLAY_MODE = os.environ.get("FRANCO_DISPLAY", "window")  # window | scaled | resizable (SDL escala WIDTH×HEIGHT a la ventana)
+
 # --- Menús / UI ---
 COLOR_BG_MENU = (16, 16, 28)
 COLOR_BG_OVER = (40, 6, 6)
@@ -90,6 +128,9 @@ PIXEL_SCALE = 3  # tamaño de cada "pixel" del sprite 8-bit
 # --- Perfiles / Highscore ---
 PROFILES_PATH = os.path.join(ASSETS_DIR, "profiles.json")  # guardamos dentro de assets
 MAX_NAME_LEN  = 12
+PROFILES_SAVE_DELAY_S = 0.5   # los cambios se agrupan: se escribe tras este tiempo sin cambios nuevos
+PROFILES_DB_PATH = os.path.join(ASSETS_DIR, "profiles.sqlite3")
+PROFILES_BACKEND = os.environ.get("FRANCO_PROFILES", "sqlite")  # sqlite | json (sin sqlite3 se usa json)
 
 # --- Audio / assets ---
 SFX_VOLUME   = 0.7
@@ -113,136 +154,858 @@ COLOR_BOSS_BULLET = (255, 220, 160)
 
 # --------------------------------
 
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Juego con Estados")
-clock = pygame.time.Clock()
+DISPLAY_FLAGS = {"window": 0, "scaled": pygame.SCALED, "resizable": pygame.SCALED | pygame.RESIZABLE}
+
+# ================================
+# ARRANQUE
+# ================================
+class Bootstrap:
+    """
+    Inicialización explícita y perezosa: cada subsistema de pygame (ventana,
+    mixer, fuentes) se levanta la primera vez que alguien lo pide, así
+    importar el módulo (tests, bench, herramientas) no abre ventana ni audio.
+    Anota cuánto tarda cada etapa (import, subsistemas, Game() con lo que
+    levanta, carga de sonidos en segundo plano y primer frame desde el inicio
+    del import) para el reporte de arranque.
+    """
+    def __init__(self):
+        self.times = {}          # etapa -> ms
+        self.first_frame_done = False
+
+    def _sdl_env(self, headless):
+        if headless:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    def mark(self, stage, t0):
+        self.times[stage] = self.times.get(stage, 0.0) + (time.perf_counter() - t0) * 1000.0
+
+    def display(self, mode=DISPLAY_MODE, headless=HEADLESS):
+        """Ventana (display + eventos); la crea la primera vez y devuelve su Surface. headless: driver dummy."""
+        surf = pygame.display.get_surface()
+        if surf is None:
+            t0 = time.perf_counter()
+            self._sdl_env(headless)
+            pygame.display.init()
+            surf = pygame.display.set_mode((WIDTH, HEIGHT), DISPLAY_FLAGS.get(mode, 0))
+            pygame.display.set_caption("Juego con Estados")
+            self.mark("display", t0)
+        return surf
+
+    def audio(self, headless=HEADLESS):
+        """Mixer en MIXER_FORMAT; False si no hay dispositivo de audio. headless: driver dummy."""
+        if pygame.mixer.get_init():
+            return True
+        t0 = time.perf_counter()
+        self._sdl_env(headless)
+        try:
+            pygame.mixer.pre_init(*MIXER_FORMAT, MIXER_BUFFER)
+            pygame.mixer.init()
+        except pygame.error:
+            return False
+        finally:
+            self.mark("audio", t0)
+        return True
+
+    def fonts(self):
+        if not pygame.font.get_init():
+            t0 = time.perf_counter()
+            pygame.font.init()
+            self.mark("fonts", t0)
+
+    def first_frame(self, game=None):
+        """Cierra el reporte en el primer frame presentado (desde el inicio del import)."""
+        self.first_frame_done = True
+        self.times["first_frame"] = (time.perf_counter() - _T_IMPORT) * 1000.0
+        if game is not None and game.audio.stats["ready_ms"] is not None:
+            self.times["assets"] = game.audio.stats["ready_ms"]
+        if STARTUP_REPORT:
+            print(self.format(), file=sys.stderr)
+
+    def report(self):
+        out = dict(self.times)
+        out["budget_ms"] = STARTUP_BUDGET_MS
+        out["over_budget"] = out.get("first_frame", 0.0) > STARTUP_BUDGET_MS
+        return out
+
+    def format(self):
+        rep = self.report()
+        parts = [f"{k} {v:.1f} ms" for k, v in self.times.items()]
+        flag = " SOBRE PRESUPUESTO" if rep["over_budget"] else ""
+        return f"arranque: {', '.join(parts)} (presupuesto {STARTUP_BUDGET_MS} ms){flag}"
+
+BOOT = Bootstrap()
+
+# ================================
+# RELOJ / INPUT INYECTABLES (headless)
+# ================================
+class SystemClock:
+    """Tiempo real en ms (monótono; no depende de que SDL haya iniciado su timer)."""
+    def __init__(self):
+        self._t0 = time.perf_counter()
+    def now(self): return int((time.perf_counter() - self._t0) * 1000)
+    def time_ms(self): return (time.perf_counter() - self._t0) * 1000.0
+    def tick(self, frames=1): pass
+
+class FrameClock:
+    """Reloj simulado: avanza un frame fijo por tick(), así la lógica corre más rápido que el tiempo real."""
+    def __init__(self, frame_ms=1000 / FPS, start_ms=0):
+        self.frame_ms = frame_ms
+        self._t = float(start_ms)
+    def now(self): return int(self._t)
+    def time_ms(self): return self._t   # sin truncar (los replays guardan el instante exacto)
+    def tick(self, frames=1): self._t += self.frame_ms * frames
+
+class KeyboardInput:
+    """Teclado real (sin ventana no hay teclado: nada presionado)."""
+    def get_pressed(self):
+        if not pygame.display.get_init():
+            return _NO_KEYS
+        return pygame.key.get_pressed()
+
+class ScriptedInput:
+    """Input programático: se consulta igual que get_pressed()."""
+    def __init__(self, keys=()):
+        self.keys = set(keys)
+    def press(self, *keys): self.keys.update(keys)
+    def release(self, *keys): self.keys.difference_update(keys)
+    def set(self, keys): self.keys = set(keys)
+    def get_pressed(self): return self
+    def __getitem__(self, key): return key in self.keys
+
+_NO_KEYS = ScriptedInput()
+_clock_source = SystemClock()
+_input_source = KeyboardInput()
+
+def get_ticks():
+    return _clock_source.now()
+
+def clock_source():
+    return _clock_source
+
+def get_pressed():
+    return _input_source.get_pressed()
+
+def use_clock(source):
+    """Reemplaza la fuente de tiempo que leen las entidades; devuelve la anterior."""
+    global _clock_source
+    prev, _clock_source = _clock_source, source
+    return prev
+
+def use_input(source):
+    """Reemplaza la fuente de teclas que leen Player/PlayState; devuelve la anterior."""
+    global _input_source
+    prev, _input_source = _input_source, source
+    return prev
 
 # ================================
 # UTILIDADES DE DIBUJO (RETRO + TEXTO)
 # ================================
-def draw_shadow_text(screen, text, size, pos, color=COLOR_TEXT, shadow=(0,0,0)):
-    font = pygame.font.SysFont(FONT_NAME, size)
+SHADOW_OFFSET = 2  # px de desplazamiento de la sombra del texto
+
+class FontRegistry:
+    """Fuentes por (nombre, tamaño): SysFont se resuelve una sola vez."""
+    def __init__(self):
+        self._fonts = {}
+    def get(self, size, name=FONT_NAME):
+        key = (name, size)
+        font = self._fonts.get(key)
+        if font is None:
+            BOOT.fonts()
+            font = pygame.font.SysFont(name, size)
+            self._fonts[key] = font
+        return font
+
+FONTS = FontRegistry()
+
+def render_text(font, text, color, shadow=None):
+    """Rasteriza el texto; con sombra devuelve una sola Surface (sombra + texto)."""
     surf = font.render(text, True, color)
-    shad = font.render(text, True, shadow)
-    x, y = pos
-    screen.blit(shad, (x+2, y+2))
-    screen.blit(surf, (x, y))
-    return surf.get_rect(topleft=pos)
+    if MEMORY.enabled:
+        MEMORY.surface_created(surf)
+    if shadow is not None:
+        shad = font.render(text, True, shadow)
+        if MEMORY.enabled:
+            MEMORY.surface_created(shad)
+        out = pygame.Surface((surf.get_width() + SHADOW_OFFSET, surf.get_height() + SHADOW_OFFSET), pygame.SRCALPHA)
+        out.blit(shad, (SHADOW_OFFSET, SHADOW_OFFSET))
+        out.blit(surf, (0, 0))
+        surf = out
+    return surf
+
+class TextCache:
+    """Cache LRU de textos ya rasterizados: (texto, tamaño, color, sombra) -> Surface."""
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._surfs = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, size, color=COLOR_TEXT, shadow=None, name=FONT_NAME):
+        key = (text, size, color, shadow, name)
+        surf = self._surfs.get(key)
+        if surf is not None:
+            self._surfs.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = render_text(FONTS.get(size, name), text, color, shadow)
+        self._surfs[key] = surf
+        if len(self._surfs) > self.max_entries:
+            self._surfs.popitem(last=False)
+        return surf
+
+    def stats(self):
+        return {"entries": len(self._surfs), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        self._surfs.clear()
+        self.hits = self.misses = 0
+
+TEXT = TextCache()
+
+class HudText:
+    """
+    Texto de HUD ligado a valores (fmt.format(*values)): sólo re-renderiza
+    cuando cambian. No pasa por TEXT para no llenar el LRU con cada puntaje.
+    """
+    def __init__(self, fmt, size, color=COLOR_TEXT, shadow=None):
+        self.fmt = fmt
+        self.size = size
+        self.color = color
+        self.shadow = shadow
+        self._values = None
+        self._surf = None
+
+    def draw(self, screen, pos, *values):
+        if self._surf is None or values != self._values:
+            self._values = values
+            self._surf = render_text(FONTS.get(self.size), self.fmt.format(*values), self.color, self.shadow)
+        screen.blit(self._surf, pos)
+        return self._surf.get_rect(topleft=pos)
+
+def _text_rect(surf, shadow):
+    w, h = surf.get_size()
+    if shadow is not None:
+        w, h = w - SHADOW_OFFSET, h - SHADOW_OFFSET
+    return pygame.Rect(0, 0, w, h)
+
+def draw_shadow_text(screen, text, size, pos, color=COLOR_TEXT, shadow=(0,0,0)):
+    surf = TEXT.render(text, size, color, shadow)
+    screen.blit(surf, pos)
+    rect = _text_rect(surf, shadow)
+    rect.topleft = pos
+    return rect
 
 def draw_centered_text(screen, text, size, y, color=COLOR_TEXT, shadow=(0,0,0)):
-    font = pygame.font.SysFont(FONT_NAME, size)
-    surf = font.render(text, True, color)
-    shad = font.render(text, True, shadow)
-    rect = surf.get_rect(center=(WIDTH//2, y))
-    screen.blit(shad, (rect.x+2, rect.y+2))
-    screen.blit(surf, rect)
+    surf = TEXT.render(text, size, color, shadow)
+    rect = _text_rect(surf, shadow)
+    rect.center = (WIDTH//2, y)
+    screen.blit(surf, rect.topleft)
     return rect
 
+_RECT_SPRITES = {}
+
+def rect_sprite(size, color, border_radius=2):
+    """Rect redondeado pre-renderizado (balas): se dibuja con un blit."""
+    key = (tuple(size), tuple(color), border_radius)
+    surf = _RECT_SPRITES.get(key)
+    if surf is None:
+        key_color = (0, 0, 0) if tuple(color[:3]) != (0, 0, 0) else (255, 0, 255)
+        surf = pygame.Surface(size)
+        surf.fill(key_color)
+        pygame.draw.rect(surf, color, (0, 0, size[0], size[1]), border_radius=border_radius)
+        surf.set_colorkey(key_color)
+        _RECT_SPRITES[key] = surf
+    return surf
+
+def brighten(color, amount=20):
+    """Variante más clara de un color (frame alterno de la animación)."""
+    return (min(255, color[0]+amount), min(255, color[1]+amount), min(255, color[2]+amount))
+
+class SpriteCache:
+    """
+    Cache LRU de sprites pre-renderizados: (patrón, color, escala) -> Surface.
+    Las variantes (brillo de animación, blanco de daño, flash del boss) son
+    simplemente otro color, así que comparten el mismo cache y el mismo límite.
+    """
+    COLORKEY = (255, 0, 255)
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._surfs = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, pattern, color, scale=PIXEL_SCALE):
+        key = (tuple(pattern), tuple(color), scale)
+        surf = self._surfs.get(key)
+        if surf is not None:
+            self._surfs.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = self._render(pattern, color, scale)
+        self._surfs[key] = surf
+        if len(self._surfs) > self.max_entries:
+            self._surfs.popitem(last=False)
+        return surf
+
+    def _render(self, pattern, color, scale):
+        key = self.COLORKEY if tuple(color[:3]) != self.COLORKEY else (0, 0, 0)
+        surf = pygame.Surface((len(pattern[0]) * scale, len(pattern) * scale))
+        surf.fill(key)
+        for r, row in enumerate(pattern):
+            for c, ch in enumerate(row):
+                if ch == "1":
+                    surf.fill(color, (c*scale, r*scale, scale, scale))
+        surf.set_colorkey(key, pygame.RLEACCEL)
+        if pygame.display.get_surface() is not None:
+            surf = surf.convert()
+        return surf
+
+    def stats(self):
+        return {"entries": len(self._surfs), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        self._surfs.clear()
+        self.hits = self.misses = 0
+
+SPRITES = SpriteCache()
+
 def draw_pixel_sprite(screen, pattern, x, y, color, scale=PIXEL_SCALE):
-    """pattern: lista de strings con '1' = pixel activo, '0' = vacío."""
-    for r, row in enumerate(pattern):
-        for c, ch in enumerate(row):
-            if ch == "1":
-                pygame.draw.rect(
-                    screen, color,
-                    pygame.Rect(x + c*scale, y + r*scale, scale, scale)
-                )
+    """pattern: lista de strings con '1' = pixel activo, '0' = vacío (un solo blit, vía SPRITES)."""
+    screen.blit(SPRITES.get(pattern, color, scale), (x, y))
 
 # ================================
 # FONDO: STARFIELD (parallax)
 # ================================
 class Starfield:
-    def __init__(self, layers=((60, 1), (40, 2), (20, 3))):
+    """
+    Fondo parallax. Cada capa se pre-renderiza una vez en una Surface
+    (posiciones generadas en bloque, escritas con surfarray si hay numpy) y
+    luego sólo se desplaza con wraparound: dos blits por capa y por frame.
+    """
+    def __init__(self, layers=STAR_LAYERS, density=STAR_DENSITY, seed=None):
+        rng = random.Random(seed)
         self.layers = []
-        for count, speed in layers:
+        for i, (count, speed) in enumerate(layers):
+            n = max(0, int(count * density))
+            col = (140 - i * 25, 200 - i * 25, 150 - i * 25)
+            size = 2 if i == 0 else 1
+            surf, stars = self._bake(n, col, size, rng)
+            dot = pygame.Surface((size, size))
+            dot.fill(col)
+            if pygame.display.get_surface() is not None:
+                dot = dot.convert()
+            self.layers.append({"surf": surf, "dot": dot, "stars": stars, "speed": speed,
+                                "offset": 0, "prev": 0, "count": n})
+
+    @staticmethod
+    def _bake(n, color, size, rng):
+        surf = pygame.Surface((WIDTH, HEIGHT))
+        surf.fill((0, 0, 0))
+        if np is not None:
+            gen = np.random.default_rng(rng.getrandbits(32))
+            xs = gen.integers(0, WIDTH, n)
+            ys = gen.integers(0, HEIGHT, n)
+            px = pygame.surfarray.pixels2d(surf)
+            mapped = surf.map_rgb(color)
+            for dx in range(size):
+                for dy in range(size):
+                    px[np.minimum(xs + dx, WIDTH - 1), np.minimum(ys + dy, HEIGHT - 1)] = mapped
+            del px  # libera el lock de la Surface
+            stars = list(zip(xs.tolist(), ys.tolist()))
+        else:
             stars = []
-            for _ in range(count):
-                x = random.randint(0, WIDTH - 1)
-                y = random.randint(0, HEIGHT - 1)
-                stars.append([x, y])
-            self.layers.append({"stars": stars, "speed": speed})
+            for _ in range(n):
+                x = rng.randint(0, WIDTH - 1)
+                y = rng.randint(0, HEIGHT - 1)
+                surf.fill(color, (x, y, size, size))
+                stars.append((x, y))
+        surf.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+        if pygame.display.get_surface() is not None:
+            surf = surf.convert()
+        return surf, stars
 
     def update(self):
+        """Un paso de lógica (lo llaman los update() de los estados, no el render)."""
+        for layer in self.layers:
+            layer["prev"] = layer["offset"]
+            layer["offset"] = (layer["offset"] + layer["speed"]) % HEIGHT
+
+    @staticmethod
+    def _offset(layer, alpha):
+        """alpha < 1: entre el paso anterior y el actual (interpolación, como el resto del render)."""
+        off = layer["offset"]
+        if alpha < 1.0:
+            prev = layer["prev"]
+            off = round(prev + ((off - prev) % HEIGHT) * alpha) % HEIGHT
+        return off
+
+    def draw(self, screen, alpha=1.0):
         for layer in self.layers:
-            for p in layer["stars"]:
-                p[1] += layer["speed"]
-                if p[1] >= HEIGHT:
-                    p[0] = random.randint(0, WIDTH - 1)
-                    p[1] = 0
+            off = self._offset(layer, alpha)
+            screen.blit(layer["surf"], (0, off))
+            if off:
+                screen.blit(layer["surf"], (0, off - HEIGHT))
 
-    def draw(self, screen):
-        for i, layer in enumerate(self.layers):
-            col = (140 - i * 25, 200 - i * 25, 150 - i * 25)
-            size = 2 if i == 0 else 1
-            for x, y in layer["stars"]:
-                screen.fill(col, (x, y, size, size))
+    def draw_stars(self, screen, alpha=1.0):
+        """Estrella por estrella (modo dirty-rect): cada una anota sólo su rect, no la capa entera."""
+        for layer in self.layers:
+            off = self._offset(layer, alpha)
+            dot = layer["dot"]
+            screen.blits([(dot, (x, (y + off) % HEIGHT)) for x, y in layer["stars"]], False)
 
 # ================================
 # OVERLAY: CRT scanlines
 # ================================
-def build_crt_overlay():
-    surf = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-    for y in range(0, HEIGHT, 2):
-        pygame.draw.line(surf, (0, 0, 0, 28), (0, y), (WIDTH, y))
-    vign = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-    pygame.draw.rect(vign, (0, 0, 0, 60), (0, 0, WIDTH, HEIGHT), width=12)
+CRT_LINE_ALPHA     = 28   # oscurecido de cada scanline
+CRT_VIGNETTE_ALPHA = 60   # oscurecido del borde
+CRT_VIGNETTE_W     = 12   # ancho del borde (px)
+
+def build_crt_overlay(size=(WIDTH, HEIGHT)):
+    w, h = size
+    surf = pygame.Surface((w, h), pygame.SRCALPHA)
+    for y in range(0, h, 2):
+        pygame.draw.line(surf, (0, 0, 0, CRT_LINE_ALPHA), (0, y), (w, y))
+    vign = pygame.Surface((w, h), pygame.SRCALPHA)
+    pygame.draw.rect(vign, (0, 0, 0, CRT_VIGNETTE_ALPHA), (0, 0, w, h), width=CRT_VIGNETTE_W)
     surf.blit(vign, (0, 0))
     return surf
 
+class CrtOverlay:
+    """
+    CRT original: overlay SRCALPHA (scanlines + viñeta) con blend alpha por
+    pixel. Sin variante convert_alpha(): la ventana ya es de 32 bits y el
+    overlay sale en su formato, así que medía igual que ésta.
+    """
+    name = "legacy"
+
+    def __init__(self):
+        self._surfs = {}
+
+    def _surface(self, size):
+        surf = self._surfs.get(size)
+        if surf is None:
+            surf = self._surfs[size] = build_crt_overlay(size)
+        return surf
+
+    def apply(self, screen, rect=None):
+        surf = self._surface(screen.get_size())
+        if rect is None:
+            screen.blit(surf, (0, 0))
+        else:
+            screen.blit(surf, rect, rect)
+
+class CrtMultiply:
+    """
+    Mismo resultado que el overlay, pero como máscara opaca (tira de scanline
+    repetida + viñeta) aplicada con BLEND_RGB_MULT: sin blend alpha por pixel.
+    """
+    name = "multiply"
+
+    def __init__(self, pitch=2):
+        self.pitch = pitch
+        self._masks = {}
+
+    def _mask(self, size):
+        mask = self._masks.get(size)
+        if mask is None:
+            w, h = size
+            line = 255 * (255 - CRT_LINE_ALPHA) // 255
+            strip = pygame.Surface((w, self.pitch))
+            strip.fill((255, 255, 255))
+            strip.fill((line, line, line), (0, 0, w, 1))
+            mask = pygame.Surface((w, h))
+            for y in range(0, h, self.pitch):
+                mask.blit(strip, (0, y))
+            v = 255 - CRT_VIGNETTE_ALPHA
+            vign = pygame.Surface((w, h))
+            vign.fill((255, 255, 255))
+            pygame.draw.rect(vign, (v, v, v), (0, 0, w, h), width=CRT_VIGNETTE_W)
+            mask.blit(vign, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
+            if pygame.display.get_surface() is not None:
+                mask = mask.convert()
+            self._masks[size] = mask
+        return mask
+
+    def apply(self, screen, rect=None):
+        mask = self._mask(screen.get_size())
+        if rect is None:
+            screen.blit(mask, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
+        else:
+            screen.blit(mask, rect, rect, special_flags=pygame.BLEND_RGB_MULT)
+
+CRT_MODES = {
+    "legacy":   CrtOverlay,
+    "multiply": CrtMultiply,
+}
+CRT_MODE = os.environ.get("FRANCO_CRT", "multiply")
+
+def make_crt(mode=None):
+    return CRT_MODES.get(mode or CRT_MODE, CrtMultiply)()
+
 # ================================
-# PERFILES: carga/guardado JSON
+# RENDER: rectángulos sucios
 # ================================
-class ProfileManager:
+def merge_rects(rects):
+    """
+    Une rects superpuestos hasta dejarlos disjuntos (así el CRT no se aplica
+    dos veces). Barrido por x: cada rect se compara sólo con los que todavía
+    lo alcanzan (con cientos de estrellas chicas, casi ninguno); una unión
+    puede alcanzar rects ya pasados, así que se repite hasta una vuelta sin
+    uniones.
+    """
+    rs = [pygame.Rect(r) for r in rects]
+    merged = True
+    while merged:
+        merged = False
+        rs.sort(key=_rect_x)
+        out, active = [], []
+        for r in rs:
+            x = r.x
+            active = [a for a in active if a.right > x]
+            i = r.collidelist(active)
+            while i != -1:
+                a = active.pop(i)
+                r.union_ip(a)
+                a.size = (0, 0)   # absorbido: se descarta al final
+                merged = True
+                i = r.collidelist(active)
+            out.append(r)
+            active.append(r)
+        rs = [r for r in out if r.w]
+    return rs
+
+def _rect_x(r): return r.x
+
+class DirtyRenderer:
+    """
+    Render por rectángulos sucios. Las capas estáticas del estado se componen
+    una sola vez en `background` (mientras no cambie state.static_key()).
+    Cada frame el estado dibuja su parte dinámica sobre este objeto, que imita
+    blit/blits de una Surface y anota rects; luego se restaura el fondo bajo
+    los rects viejos y nuevos, se re-aplican los blits, el CRT sólo sobre esas
+    zonas y se envía display.update(rects).
+    """
+    def __init__(self, size=(WIDTH, HEIGHT)):
+        self.size = size
+        self.bounds = pygame.Rect((0, 0), size)
+        self.background = None
+        self.last_dirty = []
+        self._key = None
+        self._crt = None
+        self._ops = []
+        self._rects = []
+        self._prev = []
+
+    # --- interfaz tipo Surface (para render_dynamic) ---
+    def get_size(self): return self.size
+    def get_width(self): return self.size[0]
+    def get_height(self): return self.size[1]
+    def get_rect(self, **kwargs):
+        r = pygame.Rect((0, 0), self.size)
+        for k, v in kwargs.items(): setattr(r, k, v)
+        return r
+
+    def blit(self, source, dest, area=None, special_flags=0):
+        w, h = (area[2], area[3]) if area is not None else source.get_size()
+        r = pygame.Rect(dest[0], dest[1], w, h)
+        self._ops.append((source, r.topleft, area, special_flags))
+        self._rects.append(r)
+        return r
+
+    def blits(self, blit_sequence, doreturn=True):
+        out = [self.blit(*item) for item in blit_sequence]
+        return out if doreturn else None
+
+    def invalidate(self):
+        self._key = None
+
+    def present(self, state, screen, crt=None):
+        key = state.static_key()
+        full = key != self._key or crt is not self._crt
+        if full:
+            if self.background is None:
+                self.background = pygame.Surface(self.size)
+                if pygame.display.get_surface() is not None:
+                    self.background = self.background.convert()
+            state.render_static(self.background)
+            self._key, self._crt = key, crt
+        self._ops.clear()
+        self._rects.clear()
+        state.render_dynamic(self)
+        new = [r.clip(self.bounds) for r in self._rects]
+        if full:
+            screen.blit(self.background, (0, 0))
+            screen.blits(self._ops, False)
+            if crt is not None:
+                crt.apply(screen)
+            pygame.display.flip()
+            self.last_dirty = [self.bounds]
+        else:
+            dirty = merge_rects([r for r in self._prev + new if r.w and r.h])
+            for d in dirty:
+                screen.blit(self.background, d, d)
+            screen.blits(self._ops, False)
+            if crt is not None:
+                for d in dirty:
+                    crt.apply(screen, d)
+            pygame.display.update(dirty)
+            self.last_dirty = dirty
+        self._prev = new
+
+# ================================
+# PERFILES: índice en memoria + backends (JSON / SQLite)
+# ================================
+class ProfileStore:
+    """
+    Persistencia de perfiles. load() corre al crear el ProfileManager; write()
+    en su hilo de escritura, con los récords cambiados desde la vez anterior.
+    top()/page() consultan lo ya persistido (herramientas, otros procesos).
+    """
+    def load(self): raise NotImplementedError                # -> ([(nombre, récord), ...] en orden de alta, activo)
+    def write(self, rows, last_active): raise NotImplementedError   # rows: {nombre: récord}
+    def top(self, n): raise NotImplementedError              # -> [(nombre, récord), ...] de mayor a menor
+    def page(self, offset, limit): raise NotImplementedError # -> [(nombre, récord), ...] en orden de alta
+    def close(self): pass
+
+class JsonProfileStore(ProfileStore):
+    """
+    profiles.json reescrito entero en cada write(): temporal + fsync + rename
+    atómico, con la versión anterior en .bak. Si el archivo está corrupto se
+    aparta (.corrupt) y se recupera el .bak en vez de empezar de cero.
+    """
     def __init__(self, path=PROFILES_PATH):
         self.path = path
-        self.data = {"profiles": [], "last_active": None}
-        self.load()
-        if not self.data["profiles"]:
-            self.create_profile("Guest")
-            self.set_active("Guest")
+        self._rows = {}      # nombre -> récord, en orden de alta
+        self._active = None
+        self._lock = threading.Lock()
 
     def load(self):
-        try:
-            if os.path.exists(self.path):
-                with open(self.path, "r", encoding="utf-8") as f:
-                    self.data = json.load(f)
-            else:
-                self.save()
-        except Exception:
-            self.data = {"profiles": [], "last_active": None}
-            self.save()
+        for candidate in (self.path, self.path + ".bak"):
+            try:
+                with open(candidate, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict) and isinstance(data.get("profiles"), list):
+                    self._rows = {p["name"]: p.get("high_score", 0) for p in data["profiles"]}
+                    self._active = data.get("last_active")
+                    if candidate != self.path:
+                        self._write_file()
+                    return list(self._rows.items()), self._active
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+            if candidate == self.path and os.path.exists(candidate):
+                try:   # ilegible: se aparta para que el próximo guardado no pise el .bak con él
+                    os.replace(candidate, candidate + ".corrupt")
+                except OSError:
+                    pass
+        return [], None
+
+    def write(self, rows, last_active):
+        with self._lock:
+            self._rows.update(rows)
+            self._active = last_active
+        self._write_file()
+
+    def _write_file(self):
+        """temporal + fsync + rename: el archivo nunca queda a medio escribir; el anterior pasa a .bak."""
+        with self._lock:
+            text = json.dumps({"profiles": [{"name": n, "high_score": s} for n, s in self._rows.items()],
+                               "last_active": self._active}, ensure_ascii=False, indent=2)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(self.path):
+            os.replace(self.path, self.path + ".bak")
+        os.replace(tmp, self.path)
+        if hasattr(os, "O_DIRECTORY"):   # POSIX: que los renames también lleguen al disco
+            fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def top(self, n):
+        with self._lock:
+            return heapq.nlargest(n, self._rows.items(), key=lambda kv: kv[1])
+
+    def page(self, offset, limit):
+        with self._lock:
+            return list(itertools.islice(self._rows.items(), offset, offset + limit))
+
+class SqliteProfileStore(ProfileStore):
+    """
+    Tabla indexada por nombre (UNIQUE) y por récord: top() y page() no leen
+    toda la tabla y write() sólo toca las filas cambiadas, en una transacción.
+    La primera vez importa el profiles.json existente (que queda intacto).
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS profiles (
+            id INTEGER PRIMARY KEY,                  -- orden de alta
+            name TEXT NOT NULL UNIQUE,
+            high_score INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS profiles_by_score ON profiles (high_score DESC, id);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
 
-    def save(self):
+    def __init__(self, path=PROFILES_DB_PATH, legacy_path=PROFILES_PATH):
+        self.path = path
+        self.legacy_path = legacy_path
+        self._lock = threading.Lock()   # la conexión se comparte con el hilo de escritura
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(self.SCHEMA)
+
+    def _meta(self, key):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._db.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                         "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+
+    def load(self):
+        with self._lock:
+            empty = self._db.execute("SELECT NOT EXISTS (SELECT 1 FROM profiles)").fetchone()[0]
+            if (empty and self._meta("migrated_from") is None
+                    and self.legacy_path and os.path.exists(self.legacy_path)):
+                self._migrate()
+            rows = self._db.execute("SELECT name, high_score FROM profiles ORDER BY id").fetchall()
+            return rows, self._meta("last_active")
+
+    def _migrate(self):
+        rows, active = JsonProfileStore(self.legacy_path).load()
+        with self._db:
+            self._db.executemany("INSERT OR IGNORE INTO profiles (name, high_score) VALUES (?, ?)", rows)
+            if active is not None:
+                self._set_meta("last_active", active)
+            self._set_meta("migrated_from", self.legacy_path)
+
+    def write(self, rows, last_active):
+        with self._lock, self._db:
+            self._db.executemany("INSERT INTO profiles (name, high_score) VALUES (?, ?) "
+                                 "ON CONFLICT(name) DO UPDATE SET high_score = excluded.high_score", rows.items())
+            self._set_meta("last_active", last_active)
+
+    def top(self, n):
+        with self._lock:
+            return self._db.execute("SELECT name, high_score FROM profiles ORDER BY high_score DESC, id LIMIT ?",
+                                    (n,)).fetchall()
+
+    def page(self, offset, limit):
+        with self._lock:
+            return self._db.execute("SELECT name, high_score FROM profiles ORDER BY id LIMIT ? OFFSET ?",
+                                    (limit, offset)).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+PROFILE_STORES = {"json": JsonProfileStore, "sqlite": SqliteProfileStore}
+
+def make_profile_store(kind=None):
+    """Backend configurado (PROFILES_BACKEND); sin sqlite3 o sin poder abrir la base, JSON."""
+    kind = kind or PROFILES_BACKEND
+    if kind == "sqlite":
+        if sqlite3 is None:
+            return JsonProfileStore()
         try:
-            with open(self.path, "w", encoding="utf-8") as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=2)
-        except Exception:
-            pass
+            return SqliteProfileStore()
+        except (sqlite3.Error, OSError):
+            return JsonProfileStore()
+    return PROFILE_STORES[kind]()
 
+class ProfileManager:
+    """
+    Perfiles del juego. Las consultas (perfil activo, nombres, top, páginas)
+    salen de un índice en memoria sin recorrer listas; los cambios se
+    persisten write-behind en el ProfileStore: un hilo los agrupa
+    (PROFILES_SAVE_DELAY_S) y los escribe fuera del frame loop. flush()/close()
+    escriben lo pendiente (al salir, vía atexit). Sin store, sólo en memoria.
+    """
+    def __init__(self, store=None, delay=PROFILES_SAVE_DELAY_S):
+        self.store = store
+        self.delay = delay
+        self.last_error = None
+        self._by_name = {}     # índice: nombre -> perfil
+        self._names = []       # orden de alta
+        self._pos = {}         # nombre -> posición en _names
+        self._active = None
+        self._board = None     # (n, top) cacheado; se invalida al cambiar un récord
+        self._cond = threading.Condition()
+        self._dirty = {}       # récords a escribir: nombre -> récord (el último gana)
+        self._pending = False
+        self._changed = 0.0
+        self._writing = False
+        self._urgent = False
+        self._closing = False
+        self._thread = None
+        if store is not None:
+            rows, active = store.load()
+            for name, score in rows:
+                self._add(name, score)
+            self._active = active if active in self._by_name else None
+        if not self._names:
+            self.create_profile("Guest")
+        elif self._active is None:
+            self.set_active(self._names[0])
+
+    def _add(self, name, score=0):
+        self._pos[name] = len(self._names)
+        self._names.append(name)
+        self._by_name[name] = {"name": name, "high_score": score}
+        self._board = None
+
+    # --- consultas ---
     def profiles(self):
-        return [p["name"] for p in self.data["profiles"]]
+        """Nombres en orden de alta (lista interna: no modificar)."""
+        return self._names
 
     def get_active(self):
-        name = self.data.get("last_active")
-        for p in self.data["profiles"]:
-            if p["name"] == name:
-                return p
-        return None
+        return self._by_name.get(self._active)
+
+    def top(self, n=10):
+        """Los n mejores récords [(nombre, récord), ...]; empates en orden de alta."""
+        if self._board is None or self._board[0] != n:
+            best = heapq.nlargest(n, self._by_name.values(), key=lambda p: p["high_score"])
+            self._board = (n, [(p["name"], p["high_score"]) for p in best])
+        return self._board[1]
+
+    def page(self, offset, limit):
+        """Perfiles [(nombre, récord), ...] en orden de alta, de a `limit`."""
+        by_name = self._by_name
+        return [(name, by_name[name]["high_score"]) for name in self._names[offset:offset + limit]]
 
+    # --- cambios ---
     def set_active(self, name):
-        if name in self.profiles():
-            self.data["last_active"] = name
-            self.save()
+        if name in self._by_name:
+            self._active = name
+            self._save()
             return True
         return False
 
+    def cycle_active(self, step=1):
+        """Activa el perfil siguiente (TAB) en orden de alta."""
+        if not self._names:
+            return None
+        idx = (self._pos.get(self._active, -1) + step) % len(self._names)
+        self.set_active(self._names[idx])
+        return self._active
+
     def create_profile(self, name):
         name = name.strip()[:MAX_NAME_LEN]
-        if (not name) or (name in self.profiles()):
+        if (not name) or (name in self._by_name):
             return False
-        self.data["profiles"].append({"name": name, "high_score": 0})
-        self.data["last_active"] = name
-        self.save()
+        self._add(name)
+        self._active = name
+        self._save(name)
         return True
 
     def update_high_score(self, score):
@@ -251,10 +1014,87 @@ class ProfileManager:
             return False
         if score > p.get("high_score", 0):
             p["high_score"] = score
-            self.save()
+            self._board = None
+            self._save(p["name"])
             return True
         return False
 
+    # --- escritura en segundo plano ---
+    def _save(self, name=None):
+        """Agenda la escritura (no bloquea): anota el cambio y despierta al hilo."""
+        if self.store is None:
+            return
+        with self._cond:
+            if name is not None:
+                self._dirty[name] = self._by_name[name]["high_score"]
+            self._pending = True
+            self._changed = time.monotonic()
+            if self._thread is None:
+                self._closing = False
+                self._thread = threading.Thread(target=self._writer, name="profiles-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+            self._cond.notify_all()
+
+    def flush(self, timeout=5.0):
+        """Escribe ya lo pendiente; devuelve False si no terminó en `timeout` s."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self._thread is None:
+                return True
+            self._urgent = True
+            self._cond.notify_all()
+            try:
+                while self._pending or self._writing:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        return False
+                    self._cond.wait(left)
+            finally:
+                self._urgent = False
+        return True
+
+    def close(self, timeout=5.0):
+        """Flush + fin del hilo de escritura y del store; lo que cambie después queda sólo en memoria."""
+        self.flush(timeout)
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._closing = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+            atexit.unregister(self.close)
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def _writer(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # debounce: espera un rato sin cambios nuevos (salvo flush/cierre)
+                while not (self._urgent or self._closing):
+                    left = self._changed + self.delay - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+                rows, self._dirty = self._dirty, {}
+                active = self._active
+                self._pending = False
+                self._writing = True
+            try:
+                self.store.write(rows, active)
+                self.last_error = None
+            except Exception as e:   # OSError / sqlite3.Error: el juego sigue, queda registrado
+                self.last_error = e
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
 # ================================
 # PATRONES 8-BIT
 # ================================
@@ -362,13 +1202,18 @@ class State:
     def handle_events(self, events): pass
     def update(self): pass
     def render(self, screen): pass
+    def snapshot(self): pass                # antes de cada paso: posiciones previas para interpolar el render
+    # --- modo dirty-rect (opcional) ---
+    def static_key(self): return None       # None = sin soporte: se redibuja todo con render()
+    def render_static(self, screen): pass   # capas fijas, se componen una vez por static_key
+    def render_dynamic(self, screen): pass  # lo que cambia por frame (sólo blit/blits)
 
 class MenuState(State):
     def __init__(self, game):
         super().__init__(game)
         self.mode = "main"      # "main" | "new_profile"
         self.name_buffer = ""
-        self.bg = Starfield()
+        self.bg = self.game.starfield
 
     def handle_events(self, events):
         if self.mode == "main":
@@ -377,17 +1222,12 @@ class MenuState(State):
                     if event.key == pygame.K_SPACE:
                         self.game.change_state(PlayState(self.game))
                     elif event.key == pygame.K_TAB:
-                        names = self.game.profiles.profiles()
-                        if names:
-                            cur = self.game.profiles.get_active()["name"]
-                            idx = (names.index(cur) + 1) % len(names)
-                            self.game.profiles.set_active(names[idx])
+                        self.game.profiles.cycle_active()
                     elif event.key == pygame.K_n:
                         self.mode = "new_profile"
                         self.name_buffer = ""
                     elif event.key == pygame.K_m:
-                        if pygame.mixer.music.get_busy(): pygame.mixer.music.stop()
-                        else: self.game.play_music_loop()
+                        self.game.toggle_music()
                     elif event.key == pygame.K_c:
                         self.game.crt_on = not self.game.crt_on
                     elif event.key == pygame.K_ESCAPE:
@@ -409,9 +1249,20 @@ class MenuState(State):
                             if len(self.name_buffer) < MAX_NAME_LEN:
                                 self.name_buffer += ch
 
+    def static_key(self):
+        active = self.game.profiles.get_active()
+        return ("menu", self.mode, self.name_buffer, active and active["name"], active and active.get("high_score", 0))
+
+    def update(self):
+        self.bg.update()
+
     def render(self, screen):
+        self.render_static(screen, stars=True)
+
+    def render_static(self, screen, stars=False):
         screen.fill(COLOR_BG_MENU)
-        self.bg.update(); self.bg.draw(screen)
+        if stars:
+            self.bg.draw(screen, self.game.alpha if self.game.state is self else 1.0)
         draw_centered_text(screen, TITLE, 48, 140, COLOR_ACCENT)
         active = self.game.profiles.get_active()
         best = active.get("high_score", 0) if active else 0
@@ -425,17 +1276,21 @@ class MenuState(State):
             draw_centered_text(screen, "Nuevo Perfil", 32, 230, COLOR_TEXT)
             draw_centered_text(screen, f"Nombre (ENTER confirma): {self.name_buffer}", 22, 270, COLOR_SUBTEXT)
 
-        if getattr(self.game, "crt_on", False):
-            screen.blit(self.game.crt_overlay, (0, 0))
+    def render_dynamic(self, screen):
+        # dirty-rect: las estrellas se mueven, así que van en la parte dinámica (sobre el texto)
+        self.bg.draw_stars(screen, self.game.alpha if self.game.state is self else 1.0)
 
 class GameOverState(State):
-    def __init__(self, game, final_score):
+    def __init__(self, game, final_score, play_state=None):
         super().__init__(game)
         self.final_score = final_score
+        if play_state is not None and play_state.replay is not None:
+            play_state.replay.finish(play_state)
+            self.game.save_replay(play_state.replay)
         # sonido de game over
         self.game.play_gameover()
         self.new_record = self.game.profiles.update_high_score(final_score)
-        self.bg = Starfield()
+        self.bg = self.game.starfield
 
     def handle_events(self, events):
         for event in events:
@@ -445,9 +1300,19 @@ class GameOverState(State):
                 elif event.key == pygame.K_ESCAPE:
                     pygame.quit(); sys.exit()
 
+    def static_key(self):
+        return ("over", self.final_score)
+
+    def update(self):
+        self.bg.update()
+
     def render(self, screen):
+        self.render_static(screen, stars=True)
+
+    def render_static(self, screen, stars=False):
         screen.fill(COLOR_BG_OVER)
-        self.bg.update(); self.bg.draw(screen)
+        if stars:
+            self.bg.draw(screen, self.game.alpha if self.game.state is self else 1.0)
         draw_centered_text(screen, "GAME OVER", 48, 180, COLOR_TEXT)
         draw_centered_text(screen, f"Puntaje: {self.final_score}", 28, 240, COLOR_ACCENT)
         active = self.game.profiles.get_active()
@@ -457,13 +1322,15 @@ class GameOverState(State):
         else:
             draw_centered_text(screen, f"Récord ({active['name']}): {best}", 24, 280, COLOR_SUBTEXT)
         draw_centered_text(screen, "R: volver al Menú   |   ESC: salir", 22, 340, COLOR_TEXT)
-        if getattr(self.game, "crt_on", False):
-            screen.blit(self.game.crt_overlay, (0, 0))
+
+    def render_dynamic(self, screen):
+        self.bg.draw_stars(screen, self.game.alpha if self.game.state is self else 1.0)
 
 class PauseState(State):
     def __init__(self, game, play_state):
         super().__init__(game)
         self.play_state = play_state
+        self.overlay = pygame.Surface((WIDTH, HEIGHT)); self.overlay.set_alpha(150); self.overlay.fill((0, 0, 0))
     def handle_events(self, events):
         for event in events:
             if event.type == pygame.KEYDOWN:
@@ -473,15 +1340,15 @@ class PauseState(State):
                 elif event.key == pygame.K_r:
                     self.game.change_state(PlayState(self.game))
                 elif event.key == pygame.K_m:
-                    if pygame.mixer.music.get_busy(): pygame.mixer.music.stop()
-                    else: self.game.play_music_loop()
+                    self.game.toggle_music()
                 elif event.key == pygame.K_ESCAPE:
-                    self.game.change_state(GameOverState(self.game, self.play_state.score))
+                    self.game.change_state(GameOverState(self.game, self.play_state.score, self.play_state))
     def update(self): pass
+    def static_key(self): return ("pause", id(self.play_state))
+    def render_static(self, screen): self.render(screen)
     def render(self, screen):
         self.play_state.render(screen)
-        overlay = pygame.Surface((WIDTH, HEIGHT)); overlay.set_alpha(150); overlay.fill((0, 0, 0))
-        screen.blit(overlay, (0, 0))
+        screen.blit(self.overlay, (0, 0))
         draw_centered_text(screen, "PAUSA", 48, HEIGHT//2 - 40, COLOR_TEXT)
         draw_centered_text(screen, "P: reanudar  |  R: reiniciar  |  M: música  |  ESC: terminar", 22, HEIGHT//2 + 10, COLOR_SUBTEXT)
 
@@ -519,6 +1386,8 @@ class PowerUpChoiceState(State):
 
     def apply_and_continue(self):
         self.game.play_confirm()
+        if self.play_state.replay is not None:
+            self.play_state.replay.choose(self.selection)
         if self.selection == 0:
             new_cd = int(self.play_state.fire_cooldown_ms * 0.85)
             self.play_state.fire_cooldown_ms = max(MIN_FIRE_COOLDOWN_MS, new_cd)
@@ -530,21 +1399,35 @@ class PowerUpChoiceState(State):
         self.game.change_state(self.play_state)
 
     def update(self): pass
+    def static_key(self): return ("powerup", id(self.play_state), self.selection)
+    def render_static(self, screen): self.render(screen)
+
+    _cards = {}   # (tamaño, seleccionada) -> fondo de carta pre-renderizado
+
+    @classmethod
+    def _card_surface(cls, size, selected):
+        key = (size, selected)
+        surf = cls._cards.get(key)
+        if surf is None:
+            surf = pygame.Surface(size, pygame.SRCALPHA)
+            rect = surf.get_rect()
+            pygame.draw.rect(surf, (30, 30, 30), rect, border_radius=16)
+            pygame.draw.rect(surf, (90, 90, 90), rect, width=2, border_radius=16)
+            if selected:
+                pygame.draw.rect(surf, COLOR_ACCENT, rect, width=4, border_radius=16)
+            cls._cards[key] = surf
+        return surf
 
     def _draw_card(self, screen, rect, title, pattern, selected):
-        pygame.draw.rect(screen, (30, 30, 30), rect, border_radius=16)
-        pygame.draw.rect(screen, (90, 90, 90), rect, width=2, border_radius=16)
-        if selected:
-            pygame.draw.rect(screen, COLOR_ACCENT, rect, width=4, border_radius=16)
-        font = pygame.font.SysFont(FONT_NAME, 24)
-        tt = font.render(title, True, COLOR_TEXT)
+        screen.blit(self._card_surface(rect.size, selected), rect.topleft)
+        tt = TEXT.render(title, 24, COLOR_TEXT)
         screen.blit(tt, (rect.x + (rect.w - tt.get_width()) // 2, rect.y + 14))
         icon_w = len(pattern[0]) * PIXEL_SCALE
         icon_h = len(pattern) * PIXEL_SCALE
         ix = rect.x + (rect.w - icon_w) // 2
         iy = rect.y + (rect.h - icon_h) // 2 + 6
         draw_pixel_sprite(screen, pattern, ix, iy, COLOR_ACCENT, PIXEL_SCALE)
-        tip = pygame.font.SysFont(FONT_NAME, 18).render("ENTER para elegir", True, COLOR_SUBTEXT)
+        tip = TEXT.render("ENTER para elegir", 18, COLOR_SUBTEXT)
         screen.blit(tip, (rect.x + (rect.w - tip.get_width()) // 2, rect.bottom - 28))
 
     def render(self, screen):
@@ -577,6 +1460,125 @@ class Timer:
             return True
         return False
 
+# ================================
+# PARTÍCULAS (ring buffer + puntos pre-horneados)
+# ================================
+class ParticleEngine:
+    """
+    Partículas en un ring buffer de capacidad fija (al llenarse pisa las más
+    viejas). Cada estilo (color, tamaño) tiene sus puntos pre-horneados por
+    paso de alpha, así dibujar es un solo blits() sin crear Surfaces.
+    """
+    ALPHA_SHIFT = 4  # 256 >> 4 = 16 pasos de fade
+
+    def __init__(self, capacity=1024, seed=None):
+        self.capacity = capacity
+        self.x = [0.0] * capacity
+        self.y = [0.0] * capacity
+        self.vx = [0.0] * capacity
+        self.vy = [0.0] * capacity
+        self.life = [0] * capacity    # alpha restante (0 = muerta)
+        self.decay = [0] * capacity
+        self.style_of = [0] * capacity
+        self.head = 0                 # próximo slot a escribir
+        self.span = 0                 # slots (hacia atrás desde head) que pueden estar vivos
+        self._styles = []             # (color, size)
+        self._style_ids = {}
+        self._dots = {}               # style -> [Surface por paso de alpha]
+        self.rng = random.Random(seed)  # propio: los efectos no tocan el RNG del juego
+
+    def style(self, color, size=3):
+        key = (tuple(color), size)
+        sid = self._style_ids.get(key)
+        if sid is None:
+            sid = len(self._styles)
+            self._styles.append(key)
+            self._style_ids[key] = sid
+        return sid
+
+    def _bake(self, sid):
+        color, size = self._styles[sid]
+        steps = []
+        for k in range(256 >> self.ALPHA_SHIFT):
+            dot = pygame.Surface((size, size))
+            dot.fill(color)
+            dot.set_alpha((k << self.ALPHA_SHIFT) + (1 << self.ALPHA_SHIFT) // 2)
+            steps.append(dot)
+        self._dots[sid] = steps
+        return steps
+
+    def emit(self, x, y, style, alpha=180, decay=24, vx=0.0, vy=0.0):
+        i = self.head
+        self.x[i] = x; self.y[i] = y
+        self.vx[i] = vx; self.vy[i] = vy
+        self.life[i] = alpha; self.decay[i] = decay
+        self.style_of[i] = style
+        self.head = (i + 1) % self.capacity
+        if self.span < self.capacity:
+            self.span += 1
+
+    def burst(self, x, y, color, count=8, speed=2.5, size=2, alpha=255, decay=28):
+        """Chispas radiales (p.ej. impacto)."""
+        sid = self.style(color, size)
+        rng = self.rng
+        for _ in range(count):
+            ang = rng.uniform(0, math.tau)
+            v = speed * rng.uniform(0.4, 1.0)
+            self.emit(x, y, sid, alpha, decay, math.cos(ang) * v, math.sin(ang) * v)
+
+    def update(self):
+        cap, life, decay = self.capacity, self.life, self.decay
+        x, y, vx, vy = self.x, self.y, self.vx, self.vy
+        i = (self.head - self.span) % cap
+        for _ in range(self.span):
+            if life[i] > 0:
+                life[i] -= decay[i]
+                x[i] += vx[i]; y[i] += vy[i]
+            i += 1
+            if i == cap: i = 0
+        # recorta la cola ya muerta
+        while self.span and life[(self.head - self.span) % cap] <= 0:
+            self.span -= 1
+
+    def draw(self, screen):
+        if not self.span:
+            return
+        cap, life, shift = self.capacity, self.life, self.ALPHA_SHIFT
+        dots, batch = self._dots, []
+        i = (self.head - self.span) % cap
+        for _ in range(self.span):
+            a = life[i]
+            if a > 0:
+                sid = self.style_of[i]
+                steps = dots.get(sid) or self._bake(sid)
+                half = self._styles[sid][1] // 2
+                batch.append((steps[min(a, 255) >> shift], (int(self.x[i]) - half, int(self.y[i]) - half)))
+            i += 1
+            if i == cap: i = 0
+        screen.blits(batch, False)
+
+    def clear(self):
+        for i in range(self.capacity):
+            self.life[i] = 0
+        self.span = 0
+
+    def __len__(self):
+        return sum(1 for a in self.life if a > 0)
+
+class TrailEmitter:
+    """Estela: un punto cada `every` frames de vida del proyectil."""
+    def __init__(self, engine, color=(255, 255, 255), size=3, alpha=180, decay=24, every=2):
+        self.engine = engine
+        self.style = engine.style(color, size)
+        self.alpha = alpha
+        self.decay = decay
+        self.every = every
+    def emit(self, x, y):
+        self.engine.emit(x, y, self.style, self.alpha, self.decay)
+
+PARTICLES = ParticleEngine()
+BULLET_TRAIL = TrailEmitter(PARTICLES)
+
 # ================================
 # ENTIDADES: PLAYER / BULLET / FX
 # ================================
@@ -590,11 +1592,11 @@ class Player:
         self._shake_mag  = HURT_SHAKE_MAG
 
     def hurt(self, ms=HURT_SHAKE_MS, mag=HURT_SHAKE_MAG):
-        self._hurt_until = pygame.time.get_ticks() + ms
+        self._hurt_until = get_ticks() + ms
         self._shake_mag  = mag
 
     def update(self):
-        keys = pygame.key.get_pressed()
+        keys = get_pressed()
         dx = 0
         if keys[pygame.K_LEFT] or keys[pygame.K_a]:  dx -= self.speed
         if keys[pygame.K_RIGHT] or keys[pygame.K_d]: dx += self.speed
@@ -607,7 +1609,7 @@ class Player:
         sprite_h = len(PLAYER_PATTERN) * PIXEL_SCALE
         x = self.rect.centerx - sprite_w // 2
         y = self.rect.centery - sprite_h // 2
-        now = pygame.time.get_ticks()
+        now = get_ticks()
         hurt = now < self._hurt_until
         if hurt:
             x += random.randint(-self._shake_mag, self._shake_mag)
@@ -619,13 +1621,16 @@ class Player:
         draw_pixel_sprite(screen, PLAYER_PATTERN, x, y, color, PIXEL_SCALE)
 
 class Bullet:
+    __slots__ = ("rect", "speed", "alive", "trail", "_trail_accum")
     def __init__(self, x, y):
         self.rect = pygame.Rect(0, 0, BULLET_SIZE[0], BULLET_SIZE[1])
+        self.reset(x, y)
+    def reset(self, x, y):
         self.rect.centerx = x
         self.rect.bottom  = y
         self.speed = BULLET_SPEED
         self.alive = True
-        self.trail = []
+        self.trail = BULLET_TRAIL
         self._trail_accum = 0
     def update(self):
         self.rect.y += self.speed
@@ -633,57 +1638,90 @@ class Bullet:
             self.alive = False
             return
         self._trail_accum += 1
-        if self._trail_accum % 2 == 0:
-            self.trail.append([self.rect.centerx, self.rect.y + BULLET_SIZE[1] // 2, 180])
-        for t in self.trail:
-            t[2] -= 24
-        self.trail = [t for t in self.trail if t[2] > 0]
+        if self._trail_accum % self.trail.every == 0:
+            self.trail.emit(self.rect.centerx, self.rect.y + BULLET_SIZE[1] // 2)
     def draw(self, screen):
-        for x, y, a in self.trail:
-            s = pygame.Surface((3, 3), pygame.SRCALPHA)
-            s.fill((255, 255, 255, max(0, min(255, a))))
-            screen.blit(s, (x - 1, y - 1))
-        pygame.draw.rect(screen, COLOR_BULLET, self.rect, border_radius=2)
+        screen.blit(rect_sprite(self.rect.size, COLOR_BULLET), self.rect)
+
+class ExplosionAtlas:
+    """
+    Animación de explosión pre-renderizada: una tira (atlas) por (paleta, duración)
+    con un frame por cada t cuantizado. Dibujar una explosión es un solo blit.
+    """
+    def __init__(self, max_radius=22, min_radius=4):
+        self.min_radius = min_radius
+        self.max_radius = max_radius
+        self._atlases = {}   # (color, duration_ms) -> [(subsurface, offset)]
+
+    def _steps(self, duration_ms):
+        # un frame por tick de juego (≈ FPS), mínimo 2
+        return max(2, int(math.ceil(duration_ms * FPS / 1000.0)) + 1)
+
+    def _build(self, color, duration_ms):
+        n = self._steps(duration_ms)
+        cell = self.max_radius * 2 + 2
+        strip = pygame.Surface((cell * n, cell), pygame.SRCALPHA)
+        frames = []
+        for k in range(n):
+            t = k / (n - 1)
+            radius = int(self.min_radius + (self.max_radius - self.min_radius) * t)
+            alpha = int(255 * (1 - t))
+            pygame.draw.circle(strip, (*color, alpha), (k * cell + radius + 1, radius + 1), radius)
+            frames.append((k * cell, radius * 2 + 2, radius + 1))
+        if pygame.display.get_surface() is not None:
+            strip = strip.convert_alpha()
+        out = [(strip.subsurface((x, 0, size, size)), off) for x, size, off in frames]
+        self._atlases[(color, duration_ms)] = out
+        return out
+
+    def frame(self, t, color=COLOR_EXPLOSION, duration_ms=EXPLOSION_MS):
+        """(Surface, offset) del frame para t en [0, 1]; se dibuja en (x - offset, y - offset)."""
+        frames = self._atlases.get((color, duration_ms)) or self._build(color, duration_ms)
+        t = min(max(t, 0.0), 1.0)
+        return frames[int(t * (len(frames) - 1) + 0.5)]
+
+EXPLOSIONS = ExplosionAtlas()
 
 class Explosion:
-    def __init__(self, x, y, duration_ms=EXPLOSION_MS):
+    __slots__ = ("x", "y", "start", "duration", "color", "alive")
+    def __init__(self, x, y, duration_ms=EXPLOSION_MS, color=COLOR_EXPLOSION):
+        self.reset(x, y, duration_ms, color)
+    def reset(self, x, y, duration_ms=EXPLOSION_MS, color=COLOR_EXPLOSION):
         self.x, self.y = x, y
-        self.start = pygame.time.get_ticks()
+        self.start = get_ticks()
         self.duration = duration_ms
+        self.color = color
         self.alive = True
     def update(self):
-        if pygame.time.get_ticks() - self.start >= self.duration:
+        if get_ticks() - self.start >= self.duration:
             self.alive = False
     def draw(self, screen):
-        t = (pygame.time.get_ticks() - self.start) / max(1, self.duration)
-        t = min(max(t, 0), 1)
-        radius = int(4 + 18 * t)
-        alpha  = int(255 * (1 - t))
-        # ✅ fix: tamaño (w,h) correcto
-        surf = pygame.Surface((radius*2 + 2, radius*2 + 2), pygame.SRCALPHA)
-        color = (255, 220, 160, alpha)
-        pygame.draw.circle(surf, color, (radius+1, radius+1), radius)
-        screen.blit(surf, (self.x - radius - 1, self.y - radius - 1))
+        t = (get_ticks() - self.start) / max(1, self.duration)
+        surf, off = EXPLOSIONS.frame(t, self.color, self.duration)
+        screen.blit(surf, (self.x - off, self.y - off))
 
 # ================================
 # PICKUP DE VIDA
 # ================================
 class HealthPickup:
+    __slots__ = ("w", "h", "rect", "speed", "alive", "_blink_until")
     def __init__(self, x, y, speed=HEALTH_DROP_SPEED):
         self.w = len(HEART_PATTERN[0]) * PIXEL_SCALE
         self.h = len(HEART_PATTERN) * PIXEL_SCALE
         self.rect = pygame.Rect(0, 0, self.w, self.h)
+        self.reset(x, y, speed)
+    def reset(self, x, y, speed=HEALTH_DROP_SPEED):
         self.rect.centerx = x
         self.rect.top = y
         self.speed = speed
         self.alive = True
-        self._blink_until = pygame.time.get_ticks() + 180
+        self._blink_until = get_ticks() + 180
     def update(self):
         self.rect.y += self.speed
         if self.rect.top > HEIGHT:
             self.alive = False
     def draw(self, screen):
-        now = pygame.time.get_ticks()
+        now = get_ticks()
         blink = now < self._blink_until and ((now // 80) % 2 == 0)
         color = (255, 100, 120) if blink else (255, 60, 90)
         draw_pixel_sprite(screen, HEART_PATTERN, self.rect.x, self.rect.y, color, PIXEL_SCALE)
@@ -692,8 +1730,11 @@ class HealthPickup:
 # ENEMY BULLET
 # ================================
 class EnemyBullet:
+    __slots__ = ("rect", "speed", "alive", "color")
     def __init__(self, x, y, speed=5, color=COLOR_BOSS_BULLET):
         self.rect = pygame.Rect(0, 0, 4, 12)
+        self.reset(x, y, speed, color)
+    def reset(self, x, y, speed=5, color=COLOR_BOSS_BULLET):
         self.rect.centerx = x
         self.rect.top = y
         self.speed = speed
@@ -704,19 +1745,206 @@ class EnemyBullet:
         if self.rect.top > HEIGHT:
             self.alive = False
     def draw(self, screen):
-        pygame.draw.rect(screen, self.color, self.rect, border_radius=2)
+        screen.blit(rect_sprite(self.rect.size, self.color), self.rect)
+
+# ================================
+# PROYECTILES: stores (SoA con numpy / lista de objetos)
+# ================================
+class ProjectileStore:
+    """
+    Proyectiles como structure-of-arrays (numpy): posición, velocidad, tamaño,
+    color y máscara de vivos. Movimiento, descarte fuera de pantalla y colisión
+    contra un rect son operaciones vectorizadas; los índices devueltos son
+    válidos hasta el próximo update() (que compacta conservando el orden).
+    """
+    vectorized = True
+
+    def __init__(self, capacity=64, trail=None):
+        self.trail = trail     # TrailEmitter opcional (balas del jugador)
+        self.n = 0
+        self._alloc(capacity)
+        self._palette = []     # colores -> índice
+        self._sprites = {}     # (w, h, color_id) -> Surface
+
+    def _alloc(self, capacity):
+        old_n = self.n
+        fields = {
+            "x": np.int32, "y": np.int32, "vx": np.int32, "vy": np.int32,
+            "w": np.int32, "h": np.int32, "color": np.int16, "age": np.int32, "alive": np.bool_,
+        }
+        for name, dtype in fields.items():
+            arr = np.zeros(capacity, dtype=dtype)
+            if old_n:
+                arr[:old_n] = getattr(self, name)[:old_n]
+            setattr(self, name, arr)
+        self.capacity = capacity
+
+    def _color_id(self, color):
+        try:
+            return self._palette.index(color)
+        except ValueError:
+            self._palette.append(color)
+            return len(self._palette) - 1
+
+    def spawn(self, left, top, vx, vy, size, color):
+        if self.n >= self.capacity:
+            self._alloc(self.capacity * 2)
+        i = self.n
+        self.x[i], self.y[i] = left, top
+        self.vx[i], self.vy[i] = vx, vy
+        self.w[i], self.h[i] = size
+        self.color[i] = self._color_id(color)
+        self.age[i] = 0
+        self.alive[i] = True
+        self.n += 1
+        return i
+
+    def update(self):
+        n = self.n
+        if n:
+            x, y, h, alive = self.x[:n], self.y[:n], self.h[:n], self.alive[:n]
+            x += self.vx[:n]
+            y += self.vy[:n]
+            alive &= (y + h >= 0) & (y <= HEIGHT)
+            self.age[:n] += 1
+            if self.trail is not None:
+                emit = np.flatnonzero(alive & (self.age[:n] % self.trail.every == 0))
+                if len(emit):
+                    cx = (x[emit] + self.w[:n][emit] // 2).tolist()
+                    cy = (y[emit] + h[emit] // 2).tolist()
+                    for px, py in zip(cx, cy):
+                        self.trail.emit(px, py)
+            self._compact()
+
+    def _compact(self):
+        n = self.n
+        keep = np.flatnonzero(self.alive[:n])
+        k = len(keep)
+        if k == n:
+            return
+        for name in ("x", "y", "vx", "vy", "w", "h", "color", "age", "alive"):
+            arr = getattr(self, name)
+            arr[:k] = arr[keep]
+        self.n = k
+
+    def kill(self, i):
+        self.alive[i] = False
+
+    def clear(self):
+        self.n = 0
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive[:self.n]))
+
+    def live_indices(self):
+        return np.flatnonzero(self.alive[:self.n]).tolist()
+
+    def rect(self, i):
+        return pygame.Rect(int(self.x[i]), int(self.y[i]), int(self.w[i]), int(self.h[i]))
+
+    def positions(self):
+        """Centros (x, y) de los proyectiles vivos, como array (k, 2)."""
+        n = self.n
+        m = self.alive[:n]
+        return np.stack([self.x[:n][m] + self.w[:n][m] // 2, self.y[:n][m] + self.h[:n][m] // 2], axis=1)
+
+    def collide_rect(self, rect):
+        """Índices (en orden) de proyectiles vivos que se superponen con rect."""
+        n = self.n
+        if not n:
+            return []
+        x, y = self.x[:n], self.y[:n]
+        hit = (self.alive[:n] & (x < rect.right) & (x + self.w[:n] > rect.left)
+               & (y < rect.bottom) & (y + self.h[:n] > rect.top))
+        return np.flatnonzero(hit).tolist()
+
+    def _sprite(self, w, h, cid):
+        key = (w, h, cid)
+        surf = self._sprites.get(key)
+        if surf is None:
+            surf = rect_sprite((w, h), self._palette[cid])
+            self._sprites[key] = surf
+        return surf
+
+    def draw(self, screen, alpha=1.0):
+        """alpha < 1: dibuja retrasado (1 - alpha) pasos de velocidad (interpolación; recién creados no)."""
+        idx = np.flatnonzero(self.alive[:self.n])
+        if not len(idx):
+            return
+        xs, ys = self.x[idx], self.y[idx]
+        if alpha < 1.0:
+            back = (1.0 - alpha) * (self.age[idx] > 0)
+            xs = np.rint(xs - self.vx[idx] * back).astype(np.int32)
+            ys = np.rint(ys - self.vy[idx] * back).astype(np.int32)
+        xs, ys = xs.tolist(), ys.tolist()
+        ws, hs, cs = self.w[idx].tolist(), self.h[idx].tolist(), self.color[idx].tolist()
+        screen.blits([(self._sprite(w, h, c), (x, y)) for x, y, w, h, c in zip(xs, ys, ws, hs, cs)], False)
+
+class ProjectileList:
+    """Fallback sin numpy: misma interfaz que ProjectileStore sobre objetos Bullet/EnemyBullet."""
+    vectorized = False
+
+    def __init__(self, release=None):
+        self.items = []
+        self.release = release or (lambda obj: None)
+
+    def add(self, obj):
+        self.items.append(obj)
+        return len(self.items) - 1
+
+    def update(self):
+        for o in self.items: o.update()
+        reap(self.items, self.release)
+
+    def kill(self, i):
+        self.items[i].alive = False
+
+    def clear(self):
+        for o in self.items: self.release(o)
+        self.items.clear()
+
+    def __len__(self):
+        return sum(1 for o in self.items if o.alive)
+
+    def live_indices(self):
+        return [i for i, o in enumerate(self.items) if o.alive]
+
+    def rect(self, i):
+        return self.items[i].rect
+
+    def positions(self):
+        return [o.rect.center for o in self.items if o.alive]
+
+    def collide_rect(self, rect):
+        return [i for i in rect.collidelistall([o.rect for o in self.items]) if self.items[i].alive]
+
+    def draw(self, screen, alpha=1.0):
+        if alpha >= 1.0:
+            for o in self.items: o.draw(screen)
+            return
+        for o in self.items:
+            back = round(o.speed * (1.0 - alpha))
+            o.rect.y -= back
+            o.draw(screen)
+            o.rect.y += back
+
+def make_projectile_store(trail=None, release=None):
+    """ProjectileStore (ya es su propio pool de slots) o, sin numpy, ProjectileList con pool de objetos."""
+    return ProjectileStore(trail=trail) if np is not None else ProjectileList(release=release)
 
 # ================================
 # STRATEGY movimiento enemigos
 # ================================
 class EnemyMovementStrategy:
+    rigid = False   # True: todos se mueven juntos (EnemyGrid dibuja la formación como una Surface)
     def step(self, grid): raise NotImplementedError
 
 class HorizontalBounceStrategy(EnemyMovementStrategy):
+    rigid = True
     def step(self, grid):
-        alive = grid._alive()
+        alive = grid.live()
         if not alive: return
-        now = pygame.time.get_ticks()
+        now = get_ticks()
         for e in alive:
             e.rect.x += grid.direction * grid.x_speed
             e.update_anim(now)
@@ -728,14 +1956,19 @@ class ZigZagBounceStrategy(EnemyMovementStrategy):
         self.amplitude = amplitude
         self.speed_add = speed_add
     def step(self, grid):
-        alive = grid._alive()
+        alive = grid.live()
         if not alive: return
-        now = pygame.time.get_ticks()
+        now = get_ticks()
+        left, right = 1 << 30, -(1 << 30)
         for idx, e in enumerate(alive):
             phase = (now // 16 + idx) * 0.2
-            e.rect.x += grid.direction * (grid.x_speed + self.speed_add) + int(self.amplitude * math.sin(phase))
+            r = e.rect
+            r.x += grid.direction * (grid.x_speed + self.speed_add) + int(self.amplitude * math.sin(phase))
             e.update_anim(now)
-        grid._recalc_bounds()
+            # offsets por enemigo: los extremos horizontales salen de este mismo recorrido
+            if r.left < left: left = r.left
+            if r.right > right: right = r.right
+        grid._recalc_bounds((left, right))
         grid.maybe_bounce(now, extra_margin=self.amplitude + 1)
 
 # ================================
@@ -746,28 +1979,96 @@ ENEMY_PALETTE = [
 ]
 
 class Enemy:
-    def __init__(self, x, y):
+    __slots__ = ("rect", "alive", "variant", "pattern", "color", "color_alt", "can_shoot", "_next_shot_at",
+                 "index", "row", "col")
+    def __init__(self, x, y, index=0, row=0, col=0):
         self.rect = pygame.Rect(x, y, ENEMY_SIZE[0], ENEMY_SIZE[1])
         self.alive = True
+        self.index, self.row, self.col = index, row, col   # posición en EnemyGrid (índices de vivos)
         self.variant = 0
         idx = ((x // 40) + (y // 24)) % len(ALIEN_PATTERNS)
         self.pattern = ALIEN_PATTERNS[idx]
         self.color   = ENEMY_PALETTE[((x // 40) + (y // 24)) % len(ENEMY_PALETTE)]
+        self.color_alt = brighten(self.color)
         self.can_shoot = False
         self._next_shot_at = 1_000_000_000
     def update_anim(self, now_ms):
         self.variant = (now_ms // 250) % 2
     def draw(self, screen):
-        base = self.color
-        col = (min(255, base[0]+20), min(255, base[1]+20), min(255, base[2]+20)) if self.variant else base
+        col = self.color_alt if self.variant else self.color
         sprite_w = len(self.pattern[0]) * PIXEL_SCALE
         sprite_h = len(self.pattern) * PIXEL_SCALE
         x = self.rect.centerx - sprite_w // 2
         y = self.rect.centery - sprite_h // 2
         draw_pixel_sprite(screen, self.pattern, x, y, col, PIXEL_SCALE)
 
+class FormationRenderer:
+    """
+    Formación rígida compuesta en una sola Surface por variante de animación
+    (todos los vivos comparten variante). Se dibuja con un blit relativo a un
+    enemigo "ancla". Una baja sólo borra su sprite de las Surfaces ya
+    compuestas (si era el ancla, se cambia por otro vivo); rearmar la grilla
+    invalida el cache.
+    """
+    def __init__(self):
+        self._surfs = {}     # variante -> (Surface, offset respecto del ancla)
+        self._anchor = None
+
+    def invalidate(self):
+        self._surfs.clear()
+        self._anchor = None
+
+    def remove(self, e, survivor):
+        """Borra el sprite de `e` (recién muerto) del cache; `survivor`: cualquier vivo, o None."""
+        a = self._anchor
+        if a is None: return
+        if survivor is None:
+            self.invalidate(); return
+        w = len(e.pattern[0]) * PIXEL_SCALE
+        h = len(e.pattern) * PIXEL_SCALE
+        x = e.rect.centerx - w // 2 - a.rect.x
+        y = e.rect.centery - h // 2 - a.rect.y
+        dx, dy = (a.rect.x - survivor.rect.x, a.rect.y - survivor.rect.y) if e is a else (0, 0)
+        for variant, (surf, (ox, oy)) in list(self._surfs.items()):
+            surf.fill(SpriteCache.COLORKEY, (x - ox, y - oy, w, h))
+            self._surfs[variant] = (surf, (ox + dx, oy + dy))
+        if e is a:
+            self._anchor = survivor
+
+    @staticmethod
+    def _compose(enemies, variant, anchor):
+        sprites = []
+        for e in enemies:
+            surf = SPRITES.get(e.pattern, e.color_alt if variant else e.color, PIXEL_SCALE)
+            w, h = surf.get_size()
+            sprites.append((surf, pygame.Rect(e.rect.centerx - w // 2, e.rect.centery - h // 2, w, h)))
+        box = sprites[0][1].unionall([r for _, r in sprites[1:]])
+        out = pygame.Surface(box.size)
+        out.fill(SpriteCache.COLORKEY)
+        out.blits([(surf, (r.x - box.x, r.y - box.y)) for surf, r in sprites], False)
+        out.set_colorkey(SpriteCache.COLORKEY)
+        return out, (box.x - anchor.rect.x, box.y - anchor.rect.y)
+
+    def draw(self, screen, enemies):
+        if not enemies: return
+        if self._anchor is None:
+            self._anchor = next(iter(enemies))
+        a = self._anchor
+        entry = self._surfs.get(a.variant)
+        if entry is None:
+            entry = self._surfs[a.variant] = self._compose(enemies, a.variant, a)
+        surf, (ox, oy) = entry
+        screen.blit(surf, (a.rect.x + ox, a.rect.y + oy))
+
 class EnemyGrid:
-    def __init__(self, rows=ENEMY_ROWS, x_speed=ENEMY_X_SPEED, strategy=None):
+    """
+    Formación de enemigos. Mantiene incrementalmente los vivos (dict ordenado
+    índice -> enemigo, en orden de grilla), la ocupación por fila y columna y
+    las filas/columnas extremas ocupadas: las bajas (kill) son O(1) y los
+    límites salen de las filas/columnas del borde, sin recorrer toda la grilla.
+    """
+    def __init__(self, rows=ENEMY_ROWS, x_speed=ENEMY_X_SPEED, strategy=None, rng=None):
+        self.rng = rng or random   # RNG de la sesión (PlayState.rng); sin él, el global
         self.rows = rows
         self.cols = ENEMY_COLS
         self.x_speed = x_speed
@@ -776,6 +2077,7 @@ class EnemyGrid:
         self.enemies = []
         self.bounds = pygame.Rect(0, 0, 0, 0)
         self.movement_strategy = strategy or HorizontalBounceStrategy()
+        self.formation = FormationRenderer()
         self.last_bounce = 0
         self.bounce_cooldown_ms = 400
         self._shoot_min_ms = ENEMY_SHOOT_MIN_MS
@@ -785,99 +2087,134 @@ class EnemyGrid:
         margin_x, margin_y = 60, 80
         gap_x, gap_y = 20, 18
         self.enemies.clear()
+        self._live = {}
+        self._row_live = [{} for _ in range(self.rows)]
+        self._col_live = [{} for _ in range(self.cols)]
         for r in range(self.rows):
             for c in range(self.cols):
                 x = margin_x + c * (ENEMY_SIZE[0] + gap_x)
                 y = margin_y + r * (ENEMY_SIZE[1] + gap_y)
-                self.enemies.append(Enemy(x, y))
+                i = len(self.enemies)
+                e = Enemy(x, y, i, r, c)
+                self.enemies.append(e)
+                self._live[i] = self._row_live[r][i] = self._col_live[c][i] = e
+        # filas/columnas extremas ocupadas (sólo se mueven hacia adentro)
+        self._r0, self._r1 = 0, self.rows - 1
+        self._c0, self._c1 = 0, self.cols - 1
+        self.formation.invalidate()
         self._recalc_bounds()
-    def _recalc_bounds(self):
-        rects = [e.rect for e in self.enemies if e.alive]
-        if not rects:
+    def kill(self, e):
+        """Baja de un enemigo: O(1) sobre los índices de vivos y ocupación."""
+        if not e.alive: return
+        e.alive = False
+        del self._live[e.index]
+        del self._row_live[e.row][e.index]
+        del self._col_live[e.col][e.index]
+        self.formation.remove(e, next(iter(self._live.values()), None))
+        if not self._live: return
+        while not self._row_live[self._r0]: self._r0 += 1
+        while not self._row_live[self._r1]: self._r1 -= 1
+        while not self._col_live[self._c0]: self._c0 += 1
+        while not self._col_live[self._c1]: self._c1 -= 1
+    def live(self):
+        """Enemigos vivos en orden de grilla (vista, no copia)."""
+        return self._live.values()
+    def _recalc_bounds(self, x_extent=None):
+        """Límites desde las filas/columnas extremas ocupadas; `x_extent` (left, right) si ya se conocen."""
+        if not self._live:
             self.bounds = pygame.Rect(0, 0, 0, 0); return
-        b = rects[0].copy()
-        for r in rects[1:]: b.union_ip(r)
-        self.bounds = b
-    def _alive(self):
-        return [e for e in self.enemies if e.alive]
+        # una fila se mueve siempre junta: cualquier vivo da su y
+        top = next(iter(self._row_live[self._r0].values())).rect.top
+        bottom = next(iter(self._row_live[self._r1].values())).rect.bottom
+        if x_extent is None:
+            left = min(e.rect.left for e in self._col_live[self._c0].values())
+            right = max(e.rect.right for e in self._col_live[self._c1].values())
+        else:
+            left, right = x_extent
+        self.bounds = pygame.Rect(left, top, right - left, bottom - top)
     def maybe_bounce(self, now, extra_margin=0):
         if now - self.last_bounce < self.bounce_cooldown_ms:
             return
         if self.bounds.left < 20 + extra_margin or self.bounds.right > WIDTH - 20 - extra_margin:
             self.direction *= -1
-            for e in self._alive():
+            for e in self._live.values():
                 e.rect.y += self.drop
-            self._recalc_bounds()
+            self.bounds.y += self.drop
             self.last_bounce = now
     # shooters y disparos
     def assign_shooters(self, level: int):
-        alive_idxs = [i for i, e in enumerate(self.enemies) if e.alive]
+        alive_idxs = list(self._live)
         k = min(ENEMY_SHOOTERS_PER_LEVEL, len(alive_idxs))
-        chosen = random.sample(alive_idxs, k) if k > 0 else []
+        chosen = self.rng.sample(alive_idxs, k) if k > 0 else []
         rate = max(0.7, 1.0 - 0.03 * (level - 1))
         min_ms = int(ENEMY_SHOOT_MIN_MS * rate)
         max_ms = int(ENEMY_SHOOT_MAX_MS * rate)
-        now = pygame.time.get_ticks()
+        now = get_ticks()
         for idx in chosen:
             e = self.enemies[idx]
             e.can_shoot = True
-            e._next_shot_at = now + random.randint(min_ms, max_ms)
+            e._next_shot_at = now + self.rng.randint(min_ms, max_ms)
         self._shoot_min_ms = min_ms
         self._shoot_max_ms = max_ms
     def collect_shots(self):
-        now = pygame.time.get_ticks()
+        now = get_ticks()
         out = []
-        for e in self.enemies:
-            if not (e.alive and e.can_shoot): continue
+        for e in self._live.values():
+            if not e.can_shoot: continue
             if now >= e._next_shot_at:
                 cx = e.rect.centerx
                 y  = e.rect.bottom
-                out.append(EnemyBullet(cx, y, speed=ENEMY_BULLET_SPEED_NORM, color=COLOR_ENEMY_BULLET_NORM))
-                e._next_shot_at = now + random.randint(self._shoot_min_ms, self._shoot_max_ms)
+                out.append((cx, y, ENEMY_BULLET_SPEED_NORM, COLOR_ENEMY_BULLET_NORM))
+                e._next_shot_at = now + self.rng.randint(self._shoot_min_ms, self._shoot_max_ms)
         return out
     def update(self):
         self.movement_strategy.step(self)
     def draw(self, screen):
-        for e in self.enemies:
-            if e.alive: e.draw(screen)
+        if self.movement_strategy.rigid:
+            self.formation.draw(screen, self._live.values())
+        else:   # offsets por enemigo (ZigZag): un blit por enemigo
+            for e in self._live.values(): e.draw(screen)
     def any_reached_bottom(self):
-        return any(e.alive and e.rect.bottom >= HEIGHT - 80 for e in self.enemies)
+        if not self._live: return False
+        return next(iter(self._row_live[self._r1].values())).rect.bottom >= HEIGHT - 80
     def alive_count(self):
-        return sum(1 for e in self.enemies if e.alive)
+        return len(self._live)
 
 # ================================
 # ENTIDAD: BOSS
 # ================================
 class Boss:
-    def __init__(self, hp, x_speed=BOSS_X_SPEED):
+    def __init__(self, hp, x_speed=BOSS_X_SPEED, rng=None):
+        self.rng = rng or random
         self.rect = pygame.Rect(WIDTH // 2 - BOSS_SIZE[0] // 2, 80, BOSS_SIZE[0], BOSS_SIZE[1])
         self.max_hp = hp
         self.hp = hp
         self.x_speed = x_speed
         self.direction = 1
         self.alive = True
-        self._next_shot_at = pygame.time.get_ticks() + random.randint(BOSS_SHOOT_MIN_MS, BOSS_SHOOT_MAX_MS)
+        self._next_shot_at = get_ticks() + self.rng.randint(BOSS_SHOOT_MIN_MS, BOSS_SHOOT_MAX_MS)
         self._draw_y_offset = 0
         self._hurt_until = 0
+        self._bar = None   # (ancho relleno, Surface) de la barra de vida
     def update(self):
-        now = pygame.time.get_ticks()
+        now = get_ticks()
         self.rect.x += self.direction * self.x_speed
         if self.rect.left < 20 or self.rect.right > WIDTH - 20:
             self.direction *= -1
             self.rect.x += self.direction * self.x_speed
         self._draw_y_offset = int(BOSS_BOB_AMPLITUDE * math.sin(now * BOSS_BOB_SPEED))
     def try_shoot(self):
-        now = pygame.time.get_ticks()
+        now = get_ticks()
         if now >= self._next_shot_at:
-            self._next_shot_at = now + random.randint(BOSS_SHOOT_MIN_MS, BOSS_SHOOT_MAX_MS)
+            self._next_shot_at = now + self.rng.randint(BOSS_SHOOT_MIN_MS, BOSS_SHOOT_MAX_MS)
             cx = self.rect.centerx; y = self.rect.bottom
-            return [EnemyBullet(cx, y, speed=BOSS_BULLET_SPEED, color=COLOR_BOSS_BULLET),
-                    EnemyBullet(cx - 20, y, speed=BOSS_BULLET_SPEED, color=COLOR_BOSS_BULLET),
-                    EnemyBullet(cx + 20, y, speed=BOSS_BULLET_SPEED, color=COLOR_BOSS_BULLET)]
+            return [(cx, y, BOSS_BULLET_SPEED, COLOR_BOSS_BULLET),
+                    (cx - 20, y, BOSS_BULLET_SPEED, COLOR_BOSS_BULLET),
+                    (cx + 20, y, BOSS_BULLET_SPEED, COLOR_BOSS_BULLET)]
         return []
     def take_damage(self, dmg=1):
         self.hp -= dmg
-        self._hurt_until = pygame.time.get_ticks() + 120  # flash
+        self._hurt_until = get_ticks() + 120  # flash
         if self.hp <= 0:
             self.alive = False
     def draw(self, screen):
@@ -885,25 +2222,587 @@ class Boss:
         sprite_h = len(BOSS_PATTERN) * PIXEL_SCALE
         x = self.rect.centerx - sprite_w // 2
         y = self.rect.y + (self.rect.height // 2 - sprite_h // 2) + self._draw_y_offset
-        now = pygame.time.get_ticks()
+        now = get_ticks()
         col = (255, 255, 255) if now < self._hurt_until else COLOR_BOSS
         draw_pixel_sprite(screen, BOSS_PATTERN, x, y, col, PIXEL_SCALE)
     def draw_healthbar(self, screen):
         bar_w, bar_h = 300, 12
         x = WIDTH // 2 - bar_w // 2; y = 50
-        pygame.draw.rect(screen, (60, 60, 60), (x, y, bar_w, bar_h), border_radius=4)
-        pct = max(0.0, self.hp / max(1, self.max_hp))
-        pygame.draw.rect(screen, (255, 80, 80), (x, y, int(bar_w * pct), bar_h), border_radius=4)
-        pygame.draw.rect(screen, (0, 0, 0), (x, y, bar_w, bar_h), width=2, border_radius=4)
+        fill_w = int(bar_w * max(0.0, self.hp / max(1, self.max_hp)))
+        if self._bar is None or self._bar[0] != fill_w:
+            # sólo se re-dibuja cuando cambia el largo de la barra
+            bar = pygame.Surface((bar_w, bar_h), pygame.SRCALPHA)
+            pygame.draw.rect(bar, (60, 60, 60), (0, 0, bar_w, bar_h), border_radius=4)
+            pygame.draw.rect(bar, (255, 80, 80), (0, 0, fill_w, bar_h), border_radius=4)
+            pygame.draw.rect(bar, (0, 0, 0), (0, 0, bar_w, bar_h), width=2, border_radius=4)
+            self._bar = (fill_w, bar)
+        screen.blit(self._bar[1], (x, y))
+
+# ================================
+# COLISIONES: broad-phase (spatial hash)
+# ================================
+class SpatialHash:
+    """
+    Grilla uniforme de celdas de `cell_size` px para muchos-contra-muchos
+    (balas vs enemigos). Se reconstruye una vez por frame con las entidades
+    vivas; query() devuelve sólo las que realmente colisionan, en orden de
+    inserción (igual que los loops lineales).
+    """
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._items = []
+
+    def clear(self):
+        self._cells.clear()
+        self._items.clear()
+
+    def insert(self, obj):
+        idx = len(self._items)
+        self._items.append(obj)
+        r, cs, cells = obj.rect, self.cell_size, self._cells
+        for cx in range(r.left // cs, (r.right - 1) // cs + 1):
+            for cy in range(r.top // cs, (r.bottom - 1) // cs + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = [idx]
+                else:
+                    bucket.append(idx)
+
+    def rebuild(self, objs):
+        self.clear()
+        for o in objs:
+            if o.alive:
+                self.insert(o)
+
+    def query(self, rect):
+        cs, cells = self.cell_size, self._cells
+        found = set()
+        for cx in range(rect.left // cs, (rect.right - 1) // cs + 1):
+            for cy in range(rect.top // cs, (rect.bottom - 1) // cs + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        if not found:
+            return []
+        items = self._items
+        return [items[i] for i in sorted(found) if items[i].alive and items[i].rect.colliderect(rect)]
+
+    def first(self, rect):
+        hits = self.query(rect)
+        return hits[0] if hits else None
+
+def collide_all(rect, objs):
+    """Uno-contra-muchos (player/boss vs proyectiles): un solo collidelistall en C, en orden."""
+    if not objs:
+        return []
+    idxs = rect.collidelistall([o.rect for o in objs])
+    return [objs[i] for i in idxs if objs[i].alive]
+
+# ================================
+# POOLS DE ENTIDADES + CONTROL DE GC
+# ================================
+class EntityPool:
+    """Free-list: reutiliza instancias muertas (obj.reset(...)) en vez de crear nuevas."""
+    def __init__(self, cls, max_free=256):
+        self.cls = cls
+        self.max_free = max_free
+        self._free = []
+        self.created = 0
+        self.reused = 0
+    def acquire(self, *args, **kwargs):
+        if self._free:
+            obj = self._free.pop()
+            obj.reset(*args, **kwargs)
+            self.reused += 1
+            return obj
+        self.created += 1
+        return self.cls(*args, **kwargs)
+    def release(self, obj):
+        if len(self._free) < self.max_free:
+            self._free.append(obj)
+    def stats(self):
+        return {"created": self.created, "reused": self.reused, "free": len(self._free)}
+
+def reap(items, release):
+    """Compacta `items` in-place (sin lista nueva) y devuelve los muertos al pool."""
+    j = 0
+    for o in items:
+        if o.alive:
+            items[j] = o
+            j += 1
+        else:
+            release(o)
+    del items[j:]
+
+class GcMonitor:
+    """
+    Mide las pausas del GC (gc.callbacks) y fija puntos seguros para juntar
+    basura: en el setup de nivel se colecta y se congela (gc.freeze) todo lo
+    que sobrevive, así el frame loop no vuelve a recorrer objetos longevos.
+    """
+    def __init__(self):
+        self.collections = [0, 0, 0]
+        self.pause_ms_total = 0.0
+        self.pause_ms_max = 0.0
+        self.settles = 0
+        self._t0 = None
+        self._installed = False
+
+    def install(self):
+        if not self._installed:
+            gc.callbacks.append(self._callback)
+            self._installed = True
+
+    def uninstall(self):
+        if self._installed:
+            gc.callbacks.remove(self._callback)
+            self._installed = False
+
+    def _callback(self, phase, info):
+        if phase == "start":
+            self._t0 = time.perf_counter()
+        elif self._t0 is not None:
+            ms = (time.perf_counter() - self._t0) * 1000.0
+            self._t0 = None
+            self.collections[info["generation"]] += 1
+            self.pause_ms_total += ms
+            self.pause_ms_max = max(self.pause_ms_max, ms)
+
+    def settle(self):
+        """Punto seguro (fuera del frame loop): colecta y congela lo que sobrevive."""
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+        self.settles += 1
+
+    def reset_stats(self):
+        self.collections = [0, 0, 0]
+        self.pause_ms_total = self.pause_ms_max = 0.0
+
+    def stats(self):
+        return {
+            "collections": list(self.collections),
+            "pause_ms_total": self.pause_ms_total,
+            "pause_ms_max": self.pause_ms_max,
+            "frozen": gc.get_freeze_count(),
+        }
+
+GC = GcMonitor()
+
+# ================================
+# PROFILER POR FASES
+# ================================
+PROFILE = os.environ.get("FRANCO_PROFILE") == "1"   # medir desde el arranque (si no, F3 lo activa)
+PROFILE_FRAMES = 1800                               # frames guardados en el ring buffer (~30 s)
+PROFILE_BUDGET_MS = 1000 / FPS
+PROFILE_HOTKEY = pygame.K_F3                         # overlay con el gráfico de frame-time
+PROFILE_EXPORT_KEY = pygame.K_F4                     # exportar el buffer como trace de Chrome
+
+class _Phase:
+    """Context manager reutilizable de una fase (uno por nombre, sin alocar por uso)."""
+    __slots__ = ("prof", "name", "t0")
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+        self.t0 = None
+    def __enter__(self):
+        if self.prof._frame_t0 is not None:   # sólo dentro de un frame abierto (begin_frame/end_frame)
+            self.t0 = time.perf_counter()
+            self.prof._depth += 1
+        return self
+    def __exit__(self, *exc):
+        if self.t0 is not None:
+            t1 = time.perf_counter()
+            self.prof._depth -= 1
+            self.prof._events.append((self.name, self.t0, t1 - self.t0, self.prof._depth))
+            self.t0 = None
+        return False
+
+class FrameProfiler:
+    """
+    Tiempos por fase de cada frame (Game.run, handle_events/update/render de
+    los estados y sub-fases de PlayState.update) en un ring buffer de
+    PROFILE_FRAMES frames. Apagado o fuera de un frame (simulate, replays,
+    bots), cada fase cuesta un chequeo y no anota nada.
+    Exporta el buffer como JSON de trace-events (chrome://tracing, Perfetto)
+    y dibuja un gráfico de frame-time (F3).
+    """
+    GRAPH_SIZE = (240, 80)
+    GRAPH_MS = 2 * PROFILE_BUDGET_MS       # alto del gráfico = dos frames de presupuesto
+    COLORS = {"update": (90, 200, 120), "render": (90, 150, 255), "present": (200, 160, 255)}
+
+    def __init__(self, capacity=PROFILE_FRAMES, enabled=PROFILE):
+        self.enabled = enabled
+        self.overlay = False
+        self.frames = deque(maxlen=capacity)   # (inicio s, total ms, ((fase, t0, dur s, prof.), ...))
+        self._phases = {}
+        self._events = []
+        self._depth = 0
+        self._frame_t0 = None
+        self._graph = None
+        self._label = HudText("{:5.1f} ms  upd {:4.1f}  ren {:4.1f}  max {:5.1f}", 16, COLOR_TEXT, (0, 0, 0))
+        self._label_values = (0.0, 0.0, 0.0, 0.0)
+        self._columns = 0
+
+    def phase(self, name):
+        p = self._phases.get(name)
+        if p is None:
+            p = self._phases[name] = _Phase(self, name)
+        return p
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+        if self.overlay:
+            self.enabled = True
+
+    # --- frames ---
+    def begin_frame(self):
+        self._events.clear()   # restos de un frame sin cerrar (p. ej. F3 a mitad de frame)
+        self._depth = 0
+        self._frame_t0 = time.perf_counter() if self.enabled else None
+
+    def end_frame(self):
+        t0 = self._frame_t0
+        if t0 is None:
+            return
+        self._frame_t0 = None
+        total = (time.perf_counter() - t0) * 1000.0
+        events = tuple(self._events)
+        self._events.clear()
+        self.frames.append((t0, total, events))
+        if self.overlay:
+            self._push_column(total, events)
+
+    def phase_totals(self, events):
+        out = {}
+        for name, _, dur, _ in events:
+            out[name] = out.get(name, 0.0) + dur * 1000.0
+        return out
+
+    def stats(self):
+        """Por fase (y "frame"): media, p95 y máximo en ms sobre el buffer."""
+        per = {"frame": []}
+        for _, total, events in self.frames:
+            per["frame"].append(total)
+            for name, ms in self.phase_totals(events).items():
+                per.setdefault(name, []).append(ms)
+        out = {}
+        for name, vals in per.items():
+            s = sorted(vals)
+            out[name] = {"mean": sum(s) / len(s), "p95": s[int(0.95 * (len(s) - 1))], "max": s[-1]} if s else {}
+        return out
+
+    def clear(self):
+        self.frames.clear()
+        self._events.clear()
+
+    # --- export ---
+    def export_trace(self, path):
+        """Guarda el buffer en formato trace-event de Chrome (eventos "X" en µs)."""
+        events = []
+        for t0, total, phases in self.frames:
+            events.append({"name": "frame", "ph": "X", "pid": 1, "tid": 1, "ts": t0 * 1e6, "dur": total * 1000.0})
+            for name, start, dur, depth in phases:
+                events.append({"name": name, "ph": "X", "pid": 1, "tid": 1, "ts": start * 1e6, "dur": dur * 1e6,
+                               "args": {"depth": depth}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+    # --- overlay ---
+    def _push_column(self, total, events):
+        """Desplaza el gráfico un pixel y dibuja la columna del frame (apilada por fase)."""
+        w, h = self.GRAPH_SIZE
+        if self._graph is None:
+            self._graph = pygame.Surface((w, h))
+            self._graph.fill((0, 0, 0))
+        g = self._graph
+        g.scroll(-1, 0)
+        g.fill((0, 0, 0), (w - 1, 0, 1, h))
+        px_per_ms = h / self.GRAPH_MS
+        y = h
+        totals = self.phase_totals(events)
+        for name, color in self.COLORS.items():
+            seg = int(totals.get(name, 0.0) * px_per_ms)
+            if seg:
+                g.fill(color, (w - 1, max(0, y - seg), 1, seg))
+                y -= seg
+        rest = int(total * px_per_ms) - (h - y)
+        if rest > 0:
+            g.fill((110, 110, 110), (w - 1, max(0, y - rest), 1, rest))
+        budget_y = h - int(PROFILE_BUDGET_MS * px_per_ms)
+        g.fill((255, 80, 80), (w - 1, budget_y, 1, 1))
+        self._columns += 1
+        if self._columns % 15 == 0:   # el texto se actualiza cada 15 frames
+            recent = list(self.frames)[-60:]
+            n = len(recent)
+            upd = sum(self.phase_totals(e).get("update", 0.0) for _, _, e in recent) / n
+            ren = sum(self.phase_totals(e).get("render", 0.0) for _, _, e in recent) / n
+            self._label_values = (sum(t for _, t, _ in recent) / n, upd, ren, max(t for _, t, _ in recent))
+
+    def draw(self, screen):
+        if not self.overlay or self._graph is None:
+            return
+        w, h = self.GRAPH_SIZE
+        x, y = screen.get_width() - w - 10, 10
+        screen.blit(self._graph, (x, y))
+        self._label.draw(screen, (x, y + h + 2), *self._label_values)
+
+PROFILER = FrameProfiler()
+
+# ================================
+# MONITOR DE MEMORIA
+# ================================
+MEMTRACE = os.environ.get("FRANCO_MEMTRACE") == "1"  # medir desde el arranque (si no, F5 lo activa)
+MEMTRACE_DEPTH = 8                                   # frames de stack guardados por alocación
+MEMTRACE_TOP = 25                                    # sitios listados en cada volcado
+MEMTRACE_HOTKEY = pygame.K_F5                        # 1ª vez activa el monitor; después vuelca un reporte
+SURFACE_TRANSFORMS = ("scale", "smoothscale", "scale_by", "rotate", "rotozoom", "flip")
+
+class _TrackedSurface(pygame.Surface):
+    """Surface que se anota en MEMORY al crearse (reemplaza a pygame.Surface mientras el monitor mide)."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        MEMORY.surface_created(self)
+    def copy(self):
+        return MEMORY.surface_created(super().copy())
+    def convert(self, *args):
+        return MEMORY.surface_created(super().convert(*args))
+    def convert_alpha(self, *args):
+        return MEMORY.surface_created(super().convert_alpha(*args))
+
+def _tracked_transform(fn):
+    def wrapper(surface, *args, **kwargs):
+        out = fn(surface, *args, **kwargs)
+        if out is not kwargs.get("dest", args[1] if len(args) > 1 else None):   # con dest no hay Surface nueva
+            MEMORY.surface_created(out)
+        return out
+    return wrapper
+
+class MemoryMonitor:
+    """
+    Memoria de sesiones largas, por clase del estado activo (opt-in:
+    tracemalloc frena el juego). Por frame mide bloques netos
+    (sys.getallocatedblocks), bytes trazados netos y el pico transitorio sobre
+    el inicio del frame, colecciones del GC y objetos liberados (gc.callbacks)
+    y Surfaces creadas con sus bytes. report() suma las entidades vivas por
+    clase y los sitios de alocación con más memoria; dump() lo escribe a disco
+    con el diff contra el volcado anterior.
+    """
+    FIELDS = ("frames", "blocks", "traced", "peak", "peak_max", "gc", "collected", "surfaces", "surface_bytes")
+
+    def __init__(self, depth=MEMTRACE_DEPTH):
+        self.depth = depth
+        self.enabled = False
+        self.per_state = {}
+        self._state = None
+        self._frame0 = None          # (bloques, bytes trazados) al empezar el frame
+        self._counts = [0, 0, 0, 0]  # colecciones, liberados, surfaces y bytes de surfaces del frame en curso
+        self._owns_trace = False
+        self._saved = {}
+        self._snapshot = None        # último volcado, para el diff
+
+    def start(self):
+        if self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.depth)
+            self._owns_trace = True
+        gc.callbacks.append(self._gc_callback)
+        self._saved = {"Surface": pygame.Surface}
+        pygame.Surface = _TrackedSurface
+        for name in SURFACE_TRANSFORMS:
+            fn = getattr(pygame.transform, name, None)
+            if fn is not None:
+                self._saved[name] = fn
+                setattr(pygame.transform, name, _tracked_transform(fn))
+        self.enabled = True
+
+    def stop(self):
+        if not self.enabled:
+            return
+        gc.callbacks.remove(self._gc_callback)
+        pygame.Surface = self._saved.pop("Surface")
+        for name, fn in self._saved.items():
+            setattr(pygame.transform, name, fn)
+        self._saved = {}
+        if self._owns_trace:
+            tracemalloc.stop()
+            self._owns_trace = False
+        self._frame0 = self._snapshot = None
+        self.enabled = False
+
+    def reset(self):
+        self.per_state.clear()
+
+    def _gc_callback(self, phase, info):
+        if phase == "stop":
+            self._counts[0] += 1
+            self._counts[1] += info["collected"]
+
+    def surface_created(self, surf):
+        self._counts[2] += 1
+        self._counts[3] += surf.get_width() * surf.get_height() * surf.get_bytesize()
+        return surf
+
+    # --- frames ---
+    def begin_frame(self, state):
+        if not self.enabled:
+            return
+        self._state = type(state).__name__
+        self._counts[:] = (0, 0, 0, 0)
+        tracemalloc.reset_peak()
+        self._frame0 = (sys.getallocatedblocks(), tracemalloc.get_traced_memory()[0])
+
+    def end_frame(self):
+        if self._frame0 is None:
+            return
+        blocks0, traced0 = self._frame0
+        self._frame0 = None
+        traced, peak = tracemalloc.get_traced_memory()
+        row = self.per_state.get(self._state)
+        if row is None:
+            row = self.per_state[self._state] = dict.fromkeys(self.FIELDS, 0)
+        row["frames"] += 1
+        row["blocks"] += sys.getallocatedblocks() - blocks0
+        row["traced"] += traced - traced0
+        row["peak"] += peak - traced0
+        row["peak_max"] = max(row["peak_max"], peak - traced0)
+        gcs, collected, surfaces, surface_bytes = self._counts
+        row["gc"] += gcs
+        row["collected"] += collected
+        row["surfaces"] += surfaces
+        row["surface_bytes"] += surface_bytes
+
+    # --- reportes ---
+    def live_objects(self, *roots):
+        """
+        Instancias vivas por clase del juego (más Surfaces y sus KiB),
+        alcanzables desde `roots` y las globales del módulo. Se recorre el
+        grafo con gc.get_referents porque gc.get_objects no ve lo congelado
+        por GcMonitor.settle().
+        """
+        counts = {}
+        surfaces, surface_bytes = set(), 0
+        seen = set()
+        stack = [vars(sys.modules[__name__]), *roots]
+        skip = (type, types.ModuleType, types.FunctionType)   # no salir del módulo por clases/funciones ajenas
+        while stack:
+            o = stack.pop()
+            if id(o) in seen:
+                continue
+            seen.add(id(o))
+            cls = type(o)
+            if cls.__module__ == __name__ and cls is not _TrackedSurface:
+                counts[cls.__name__] = counts.get(cls.__name__, 0) + 1
+            for ref in gc.get_referents(o):
+                if isinstance(ref, pygame.surface.Surface):
+                    if id(ref) not in surfaces:   # las Surfaces de pygame no están trazadas por el GC
+                        surfaces.add(id(ref))
+                        surface_bytes += ref.get_width() * ref.get_height() * ref.get_bytesize()
+                elif gc.is_tracked(ref) and not isinstance(ref, skip):
+                    stack.append(ref)
+        counts = dict(sorted(counts.items(), key=lambda kv: -kv[1]))
+        counts["Surface"] = len(surfaces)
+        counts["Surface KiB"] = surface_bytes // 1024
+        return counts
+
+    def take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            tracemalloc.Filter(False, "*/linecache.py"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def report(self, game=None, snapshot=None, top=MEMTRACE_TOP):
+        """Promedios por frame de cada estado, entidades vivas y (trazando) los `top` sitios de alocación."""
+        states = {}
+        for name, row in self.per_state.items():
+            n = max(1, row["frames"])
+            states[name] = {
+                "frames": row["frames"],
+                "blocks_per_frame": row["blocks"] / n,
+                "traced_kib_per_frame": row["traced"] / n / 1024,
+                "peak_kib_per_frame": row["peak"] / n / 1024,
+                "peak_kib_max": row["peak_max"] / 1024,
+                "gc_per_frame": row["gc"] / n,
+                "collected_per_frame": row["collected"] / n,
+                "surfaces_per_frame": row["surfaces"] / n,
+                "surface_kib_per_frame": row["surface_bytes"] / n / 1024,
+            }
+        out = {"states": states, "live": self.live_objects(*([game] if game is not None else []))}
+        if tracemalloc.is_tracing():
+            snapshot = snapshot or self.take_snapshot()
+            out["traced_kib"] = tracemalloc.get_traced_memory()[0] / 1024
+            out["top"] = [(str(s.traceback[0]), s.size / 1024, s.count)
+                          for s in snapshot.statistics("lineno")[:top]]
+        return out
+
+    def dump(self, path, game=None, top=MEMTRACE_TOP):
+        """Escribe el reporte en texto; con un volcado previo agrega los sitios que más crecieron desde entonces."""
+        snapshot = self.take_snapshot() if tracemalloc.is_tracing() else None
+        rep = self.report(game, snapshot, top)
+        lines = [f"{'estado':18s} {'frames':>7s} {'bloq/f':>8s} {'KiB/f':>8s} {'pico/f':>8s} {'pico max':>9s} "
+                 f"{'gc/f':>6s} {'lib/f':>7s} {'surf/f':>7s} {'KiB surf/f':>10s}"]
+        for name, s in rep["states"].items():
+            lines.append(f"{name:18s} {s['frames']:7d} {s['blocks_per_frame']:+8.2f} {s['traced_kib_per_frame']:+8.3f} "
+                         f"{s['peak_kib_per_frame']:8.2f} {s['peak_kib_max']:9.1f} {s['gc_per_frame']:6.3f} "
+                         f"{s['collected_per_frame']:7.2f} {s['surfaces_per_frame']:7.2f} {s['surface_kib_per_frame']:10.2f}")
+        lines += ["", "entidades vivas:"] + [f"  {name:24s} {n}" for name, n in rep["live"].items()]
+        if snapshot is not None:
+            lines += ["", f"trazado: {rep['traced_kib']:.1f} KiB; top {top} sitios (KiB, bloques):"]
+            lines += [f"  {kib:9.1f} {count:7d}  {where}" for where, kib, count in rep["top"]]
+            lines += ["", "stacks más pesados:"]
+            for stat in snapshot.statistics("traceback")[:5]:
+                lines.append(f"  {stat.size / 1024:.1f} KiB en {stat.count} bloques")
+                lines += ["    " + line for line in stat.traceback.format()]
+            if self._snapshot is not None:
+                lines += ["", "diff contra el volcado anterior (KiB, bloques):"]
+                lines += [f"  {d.size_diff / 1024:+9.1f} {d.count_diff:+7d}  {d.traceback[0]}"
+                          for d in snapshot.compare_to(self._snapshot, "lineno")[:top]]
+            self._snapshot = snapshot
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+MEMORY = MemoryMonitor()
 
 # ================================
 # FACTORY
 # ================================
 class EntityFactory:
-    def create_bullet(self, x, y): return Bullet(x, y)
-    def create_explosion(self, x, y): return Explosion(x, y)
-    def create_enemy_bullet(self, x, y, speed, color): return EnemyBullet(x, y, speed, color)
-    def create_health_pickup(self, x, y): return HealthPickup(x, y)
+    """
+    Crea entidades. Las balas van directo a los stores de proyectiles de la
+    sesión; el resto sale de pools y vuelve con release() al morir.
+    """
+    def __init__(self, rng=None):
+        self.rng = rng or random   # RNG de la sesión: grilla y boss lo comparten
+        self.pools = {cls: EntityPool(cls) for cls in (Bullet, EnemyBullet, Explosion, HealthPickup)}
+        self.bullets = make_projectile_store(trail=BULLET_TRAIL, release=self.release)
+        self.enemy_bullets = make_projectile_store(release=self.release)
+    def release(self, obj):
+        self.pools[type(obj)].release(obj)
+    def release_all(self, items):
+        for o in items: self.release(o)
+        items.clear()
+    def pool_stats(self):
+        return {cls.__name__: pool.stats() for cls, pool in self.pools.items()}
+    def create_bullet(self, x, y):
+        """Bala del jugador centrada en x con la base en y; devuelve su índice en self.bullets."""
+        if self.bullets.vectorized:
+            w, h = BULLET_SIZE
+            return self.bullets.spawn(x - w // 2, y - h, 0, BULLET_SPEED, BULLET_SIZE, COLOR_BULLET)
+        return self.bullets.add(self.pools[Bullet].acquire(x, y))
+    def create_explosion(self, x, y, color=COLOR_EXPLOSION):
+        return self.pools[Explosion].acquire(x, y, EXPLOSION_MS, color)
+    def create_enemy_bullet(self, x, y, speed, color):
+        """Bala enemiga centrada en x con el tope en y; devuelve su índice en self.enemy_bullets."""
+        if self.enemy_bullets.vectorized:
+            return self.enemy_bullets.spawn(x - 2, y, 0, speed, (4, 12), color)
+        return self.enemy_bullets.add(self.pools[EnemyBullet].acquire(x, y, speed, color))
+    def create_health_pickup(self, x, y): return self.pools[HealthPickup].acquire(x, y)
     def create_enemy_grid(self, level: int) -> 'EnemyGrid':
         rows = min(ENEMY_ROWS + (level // 2), 6)
         speed = ENEMY_X_SPEED + (level - 1) * max(0.15, ENEMY_X_STEP_RAMP * 0.6)
@@ -912,7 +2811,7 @@ class EntityFactory:
             strategy = ZigZagBounceStrategy(amplitude=amp)
         else:
             strategy = HorizontalBounceStrategy()
-        grid = EnemyGrid(rows=rows, x_speed=speed, strategy=strategy)
+        grid = EnemyGrid(rows=rows, x_speed=speed, strategy=strategy, rng=self.rng)
         grid.drop = max(12, ENEMY_DROP - max(0, level-1))
         grid.assign_shooters(level)
         return grid
@@ -920,20 +2819,28 @@ class EntityFactory:
         cycles = max(1, level // BOSS_EVERY_N_LEVELS)
         hp = BOSS_BASE_HP + (cycles - 1) * BOSS_HP_PER_CYCLE
         x_speed = BOSS_X_SPEED + 0.2 * (cycles - 1)
-        return Boss(hp=hp, x_speed=x_speed)
+        return Boss(hp=hp, x_speed=x_speed, rng=self.rng)
 
 # ================================
 # PLAY STATE
 # ================================
 class PlayState(State):
-    def __init__(self, game):
+    def __init__(self, game, seed=None, level=1):
         super().__init__(game)
         self.game.play_music_loop()
+        # toda la aleatoriedad de la partida sale de acá: (seed, level, inputs) la reproducen
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        if not 0 <= self.seed < 1 << 32:   # el replay la guarda como uint32
+            raise ValueError(f"seed fuera de rango (0 .. 2**32 - 1): {self.seed}")
+        self.rng = random.Random(self.seed)
+        self.replay = Replay.start(self.seed, level) if game.record_replays else None
         self.player = Player(WIDTH // 2, HEIGHT - 60)
-        self.bullets = []
+        self.factory = EntityFactory(self.rng)
+        self.bullets = self.factory.bullets
+        PARTICLES.clear()
         self.fire_timer = Timer()
         self.explosions = []
-        self.bg = Starfield(layers=((80, 1), (50, 2), (25, 3)))
+        self.bg = self.game.starfield
         self.health_pickups = []
 
         # Stats arma (power-ups)
@@ -941,19 +2848,27 @@ class PlayState(State):
         self.max_bullets      = MAX_BULLETS
         self.shot_count       = SHOT_COUNT_BASE
 
-        self.level = 1
-        self.factory = EntityFactory()
+        self.level = level
         self.enemy_grid = None
-        self.enemy_bullets = []
+        self.enemy_bullets = self.factory.enemy_bullets
         self.boss = None
         self.score = 0
         self.lives = LIVES
+
+        # broad-phase enemigos (consultado por cada bala)
+        self.enemy_hash = SpatialHash(cell_size=64)
+
+        # HUD: sólo se re-renderiza cuando cambian los valores
+        self.hud_main = HudText("{}  |  Score: {}   Lives: {}/{}   Level: {}   Best: {}", 24, COLOR_TEXT)
+        self.hud_info = HudText("Bullets cap: {}  |  Cooldown: {} ms  |  Shot: x{}", 18, COLOR_SUBTEXT)
+        self._hud_panels = {}
+        self._prev = []          # (rect, x, y) antes del último paso (interpolación)
         self._setup_level()
 
     def _setup_level(self):
         self.enemy_bullets.clear()
-        self.explosions.clear()
-        self.health_pickups.clear()
+        self.factory.release_all(self.explosions)
+        self.factory.release_all(self.health_pickups)
         if self.level % BOSS_EVERY_N_LEVELS == 0:
             self.boss = self.factory.create_boss(self.level)
             self.enemy_grid = None
@@ -961,6 +2876,7 @@ class PlayState(State):
         else:
             self.boss = None
             self.enemy_grid = self.factory.create_enemy_grid(self.level)
+        GC.settle()
 
     def _level_up_with_powerup(self, bonus):
         self.score += bonus
@@ -977,24 +2893,33 @@ class PlayState(State):
         self.game.play_hurt()
         self.lives -= damage
         if self.lives <= 0:
-            self.game.change_state(GameOverState(self.game, self.score))
+            self.game.change_state(GameOverState(self.game, self.score, self))
+
+    def _spawn_enemy_shots(self, shots):
+        for x, y, speed, color in shots:
+            self.factory.create_enemy_bullet(x, y, speed, color)
+        self.game.play_enemy_shoot()
+
+    def _collide_enemy_bullets(self):
+        for i in self.enemy_bullets.collide_rect(self.player.rect):
+            self.enemy_bullets.kill(i)
+            self._on_player_hit(1)
 
     def handle_events(self, events):
         for event in events:
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
-                    self.game.change_state(GameOverState(self.game, self.score))
+                    self.game.change_state(GameOverState(self.game, self.score, self))
                 elif event.key == pygame.K_p:
                     self.game.play_pause_in()
                     self.game.change_state(PauseState(self.game, self))
                 elif event.key == pygame.K_m:
-                    if pygame.mixer.music.get_busy(): pygame.mixer.music.stop()
-                    else: self.game.play_music_loop()
+                    self.game.toggle_music()
                 elif event.key == pygame.K_c:
                     self.game.crt_on = not self.game.crt_on
 
     def shoot(self):
-        now = pygame.time.get_ticks()
+        now = get_ticks()
         if (len(self.bullets) + self.shot_count) <= self.max_bullets and \
            self.fire_timer.ready(now, self.fire_cooldown_ms):
 
@@ -1002,307 +2927,829 @@ class PlayState(State):
             y  = self.player.rect.top
 
             if self.shot_count == 1:
-                self.bullets.append(self.factory.create_bullet(cx, y))
+                self.factory.create_bullet(cx, y)
             else:
                 offs = [-SHOT_SPREAD_PX // 2, SHOT_SPREAD_PX // 2]
                 for off in offs:
-                    self.bullets.append(self.factory.create_bullet(cx + off, y))
+                    self.factory.create_bullet(cx + off, y)
 
             self.game.play_shoot()
 
     def update(self):
+        if self.replay is not None:
+            self.replay.capture(get_pressed())
+        self.bg.update()
+        prof = PROFILER
         self.player.update()
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_SPACE]:
-            self.shoot()
+        with prof.phase("player_bullets"):
+            keys = get_pressed()
+            if keys[pygame.K_SPACE]:
+                self.shoot()
 
-        # balas propias
-        for b in self.bullets: b.update()
-        self.bullets = [b for b in self.bullets if b.alive]
+            # balas propias
+            self.bullets.update()
+            PARTICLES.update()
 
         # pickups de vida
-        for hp in self.health_pickups: hp.update()
-        for hp in list(self.health_pickups):
-            if hp.alive and hp.rect.colliderect(self.player.rect):
+        with prof.phase("collisions"):
+            for hp in self.health_pickups: hp.update()
+            for hp in collide_all(self.player.rect, self.health_pickups):
                 if self.lives < MAX_LIVES:
                     self.lives = min(MAX_LIVES, self.lives + 1)
                     self.game.play_powerup()
                 hp.alive = False
-        self.health_pickups = [hp for hp in self.health_pickups if hp.alive]
+            reap(self.health_pickups, self.factory.release)
 
         if self.boss:
             # --- MODO BOSS ---
-            self.boss.update()
-            new_shots = self.boss.try_shoot()
-            if new_shots:
-                self.enemy_bullets.extend(new_shots)
-                self.game.play_enemy_shoot()
-
-            for eb in self.enemy_bullets: eb.update()
-            self.enemy_bullets = [eb for eb in self.enemy_bullets if eb.alive]
-
-            for eb in self.enemy_bullets:
-                if eb.alive and eb.rect.colliderect(self.player.rect):
-                    eb.alive = False
-                    self._on_player_hit(1)
-
-            for b in self.bullets:
-                if not b.alive: continue
-                if self.boss.alive and b.rect.colliderect(self.boss.rect):
-                    b.alive = False
-                    self.boss.take_damage(1)
-                    self.explosions.append(self.factory.create_explosion(b.rect.centerx, b.rect.centery))
-                    self.game.play_hit()
+            with prof.phase("grid"):
+                self.boss.update()
+            with prof.phase("enemy_shots"):
+                new_shots = self.boss.try_shoot()
+                if new_shots:
+                    self._spawn_enemy_shots(new_shots)
+
+                self.enemy_bullets.update()
+
+            with prof.phase("collisions"):
+                self._collide_enemy_bullets()
+
+                for i in self.bullets.collide_rect(self.boss.rect):
+                    if self.boss.alive:
+                        self.bullets.kill(i)
+                        self.boss.take_damage(1)
+                        r = self.bullets.rect(i)
+                        self.explosions.append(self.factory.create_explosion(r.centerx, r.centery))
+                        PARTICLES.burst(r.centerx, r.top, COLOR_BOSS, count=6)
+                        self.game.play_hit()
 
             if not self.boss.alive:
                 self._level_up_with_powerup(BOSS_KILL_BONUS)
 
         else:
             # --- MODO NORMAL (grilla) ---
-            self.enemy_grid.update()
+            with prof.phase("grid"):
+                self.enemy_grid.update()
 
             # disparos ocasionales
-            new_eb = self.enemy_grid.collect_shots()
-            if new_eb:
-                self.enemy_bullets.extend(new_eb)
-                self.game.play_enemy_shoot()
+            with prof.phase("enemy_shots"):
+                new_eb = self.enemy_grid.collect_shots()
+                if new_eb:
+                    self._spawn_enemy_shots(new_eb)
+
+                self.enemy_bullets.update()
+
+            with prof.phase("collisions"):
+                self._collide_enemy_bullets()
+
+                # colisiones bala–enemigo (broad-phase: sólo enemigos vivos en celdas cercanas)
+                live = self.bullets.live_indices()
+                if live:
+                    self.enemy_hash.rebuild(self.enemy_grid.live())
+                for i in live:
+                    e = self.enemy_hash.first(self.bullets.rect(i))
+                    if e is None: continue
+                    self.enemy_grid.kill(e)
+                    self.bullets.kill(i)
+                    self.explosions.append(self.factory.create_explosion(e.rect.centerx, e.rect.centery))
+                    PARTICLES.burst(e.rect.centerx, e.rect.centery, e.color)
+                    self.score += SCORE_PER_ENEMY
+                    self.game.play_hit()
 
-            for eb in self.enemy_bullets: eb.update()
-            self.enemy_bullets = [eb for eb in self.enemy_bullets if eb.alive]
+                    # chance de dropear vida
+                    if self.lives < MAX_LIVES and self.rng.random() < HEALTH_DROP_CHANCE:
+                        self.health_pickups.append(self.factory.create_health_pickup(e.rect.centerx, e.rect.centery))
 
-            for eb in self.enemy_bullets:
-                if eb.alive and eb.rect.colliderect(self.player.rect):
-                    eb.alive = False
+                if self.enemy_grid.any_reached_bottom():
                     self._on_player_hit(1)
-
-            # colisiones bala–enemigo
-            for b in self.bullets:
-                if not b.alive: continue
-                for e in self.enemy_grid.enemies:
-                    if e.alive and b.rect.colliderect(e.rect):
-                        e.alive = False
-                        b.alive = False
-                        self.explosions.append(self.factory.create_explosion(e.rect.centerx, e.rect.centery))
-                        self.score += SCORE_PER_ENEMY
-                        self.game.play_hit()
-
-                        # chance de dropear vida
-                        if self.lives < MAX_LIVES and random.random() < HEALTH_DROP_CHANCE:
-                            self.health_pickups.append(self.factory.create_health_pickup(e.rect.centerx, e.rect.centery))
-
-                        break
-
-            if self.enemy_grid.any_reached_bottom():
-                self._on_player_hit(1)
-                for e in self.enemy_grid.enemies:
-                    e.rect.y -= ENEMY_DROP * 2
+                    for e in self.enemy_grid.enemies:
+                        e.rect.y -= ENEMY_DROP * 2
 
             if self.enemy_grid.alive_count() == 0:
                 self._level_up_with_powerup(LEVEL_CLEAR_BONUS)
 
         # explosiones
-        for ex in self.explosions: ex.update()
-        self.explosions = [ex for ex in self.explosions if ex.alive]
+        with prof.phase("explosions"):
+            for ex in self.explosions: ex.update()
+            reap(self.explosions, self.factory.release)
+
+    def snapshot(self):
+        prev = self._prev
+        prev.clear()
+        movers = [self.player.rect] + [hp.rect for hp in self.health_pickups]
+        if self.boss: movers.append(self.boss.rect)
+        else: movers.extend(e.rect for e in self.enemy_grid.live())
+        for r in movers:
+            prev.append((r, r.x, r.y))
+
+    def _interpolate(self, alpha):
+        """Lleva los rects a prev + (actual - prev) * alpha; devuelve [(rect, x, y)] para restaurarlos."""
+        moved = []
+        for r, px, py in self._prev:
+            x, y = r.x, r.y
+            dx, dy = x - px, y - py
+            if (dx or dy) and abs(dx) <= INTERP_MAX_JUMP and abs(dy) <= INTERP_MAX_JUMP:
+                r.x = px + round(dx * alpha)
+                r.y = py + round(dy * alpha)
+                moved.append((r, x, y))
+        return moved
+
+    def static_key(self):
+        return ("play", self.boss is not None)
 
     def render(self, screen):
+        self.render_static(screen, stars=True)
+        self.render_dynamic(screen, stars=False)
+
+    def render_static(self, screen, stars=False):
         screen.fill(COLOR_BG_PLAY)
-        self.bg.update(); self.bg.draw(screen)
+        if stars:
+            self.bg.draw(screen, self.game.alpha if self.game.state is self else 1.0)
 
         # HUD panel
         hud_h = 52 if not self.boss else 72
-        panel = pygame.Surface((WIDTH, hud_h), pygame.SRCALPHA)
-        pygame.draw.rect(panel, (0, 0, 0, 110), (8, 8, WIDTH - 16, hud_h - 16), border_radius=16)
+        panel = self._hud_panels.get(hud_h)
+        if panel is None:
+            panel = pygame.Surface((WIDTH, hud_h), pygame.SRCALPHA)
+            pygame.draw.rect(panel, (0, 0, 0, 110), (8, 8, WIDTH - 16, hud_h - 16), border_radius=16)
+            self._hud_panels[hud_h] = panel
         screen.blit(panel, (0, 0))
 
+    def render_dynamic(self, screen, stars=True):
+        # entre pasos de lógica se dibuja interpolado (sólo si este estado es el que corre)
+        alpha = self.game.alpha if self.game.state is self else 1.0
+        moved = self._interpolate(alpha) if alpha < 1.0 else ()
+        if stars:   # dirty-rect: el fondo compuesto no tiene estrellas
+            self.bg.draw_stars(screen, alpha)
+
         self.player.draw(screen)
         if self.boss: self.boss.draw(screen)
         else: self.enemy_grid.draw(screen)
 
-        for b in self.bullets: b.draw(screen)
+        PARTICLES.draw(screen)
+        self.bullets.draw(screen, alpha)
         for ex in self.explosions: ex.draw(screen)
-        for eb in self.enemy_bullets: eb.draw(screen)
+        self.enemy_bullets.draw(screen, alpha)
         for hp in self.health_pickups: hp.draw(screen)
 
+        for r, x, y in moved:
+            r.x, r.y = x, y
+
         # HUD
-        font = pygame.font.SysFont(FONT_NAME, 24)
         active = self.game.profiles.get_active()
         best = active.get("high_score", 0) if active else 0
         pname = active["name"] if active else "Guest"
-        hud = font.render(f"{pname}  |  Score: {self.score}   Lives: {self.lives}/{MAX_LIVES}   Level: {self.level}   Best: {best}", True, COLOR_TEXT)
-        screen.blit(hud, (10, 10))
+        self.hud_main.draw(screen, (10, 10), pname, self.score, self.lives, MAX_LIVES, self.level, best)
 
         if self.boss:
-            font_small = pygame.font.SysFont(FONT_NAME, 20)
-            boss_txt = font_small.render("BOSS LEVEL", True, COLOR_ACCENT)
-            screen.blit(boss_txt, (10, 40))
+            screen.blit(TEXT.render("BOSS LEVEL", 20, COLOR_ACCENT), (10, 40))
             self.boss.draw_healthbar(screen)
 
-        font_small = pygame.font.SysFont(FONT_NAME, 18)
-        info = font_small.render(
-            f"Bullets cap: {self.max_bullets}  |  Cooldown: {self.fire_cooldown_ms} ms  |  Shot: x{self.shot_count}",
-            True, COLOR_SUBTEXT
-        )
-        screen.blit(info, (10, 36 if not self.boss else 60))
+        self.hud_info.draw(screen, (10, 36 if not self.boss else 60),
+                           self.max_bullets, self.fire_cooldown_ms, self.shot_count)
 
-        if getattr(self.game, "crt_on", False):
-            screen.blit(self.game.crt_overlay, (0, 0))
+# ================================
+# AUDIO: manifest + carga en paralelo con caché
+# ================================
+# clave -> archivos candidatos (assets/ o assets/sonidos/). Se cargan todas las variantes
+# que existan; el orden es el de prioridad (primero lo que suena en el menú).
+SOUND_MANIFEST = {
+    "select":      ("select.wav",),
+    "confirm":     ("confirm.wav",),
+    "shoot":       ("shoot.wav", "shoot1.wav", "shoot2.wav", "laser.wav"),
+    "hit":         ("hit.wav",),
+    "hurt":        ("hurt.wav",),
+    "enemy_shoot": ("enemy_shoot.wav",),
+    "powerup":     ("powerup.wav",),
+    "levelup":     ("levelup.wav",),
+    "boss_warn":   ("boss_warn.wav",),
+    "pause_in":    ("pause_in.wav",),
+    "pause_out":   ("pause_out.wav",),
+    "gameover":    ("gameover.wav",),
+}
+MUSIC_CANDIDATES = ("bgm.mp3", "bgm.wav")
+AUDIO_WORKERS = 4
+AUDIO_CACHE_DIR = os.environ.get("FRANCO_AUDIO_CACHE", os.path.join(BASE_DIR, ".audio-cache"))  # "" = sin caché
+
+def resolve_asset(filename):
+    """Busca en assets/ y assets/sonidos/."""
+    for path in (os.path.join(ASSETS_DIR, filename), os.path.join(ASSETS_DIR, "sonidos", filename)):
+        if os.path.exists(path):
+            return path
+    return None
+
+class AudioAssets:
+    """
+    Sonidos del SOUND_MANIFEST decodificados en un pool de hilos. Cada WAV ya
+    convertido al formato del mixer se guarda crudo en AUDIO_CACHE_DIR (la
+    clave incluye tamaño, mtime y formato), así un arranque en caliente sólo
+    copia muestras. Hasta que un sonido está listo, get() devuelve None y el
+    efecto no suena (placeholder silencioso): el menú aparece sin esperar.
+    """
+    def __init__(self, manifest=SOUND_MANIFEST, cache_dir=AUDIO_CACHE_DIR, workers=AUDIO_WORKERS):
+        self.manifest = manifest
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.music_ready = False
+        self._variants = {}    # clave -> [Sound, ...] en el orden del manifest
+        self._loaded = {}      # archivo -> Sound
+        self._lock = threading.Lock()
+        self._pool = None
+        self._futures = []
+        self._remaining = 0
+        self._format = None
+        self._t0 = None
+        self.stats = {"decoded": 0, "cached": 0, "failed": 0, "ready_ms": None}
+
+    def start(self):
+        """Encola la carga (requiere el mixer iniciado); vuelve enseguida."""
+        self._format = pygame.mixer.get_init()
+        if self._format is None or self._pool is not None:
+            return
+        if self.cache_dir:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            except OSError:
+                self.cache_dir = ""
+        self._t0 = time.perf_counter()
+        tasks = [(self._load, key, fname, path) for key, files in self.manifest.items()
+                 for fname, path in ((f, resolve_asset(f)) for f in files) if path]
+        music = next(filter(None, map(resolve_asset, MUSIC_CANDIDATES)), None)
+        if music:
+            tasks.append((self._load_music, music))
+        self._remaining = len(tasks)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="audio")
+        self._futures = [self._pool.submit(*task) for task in tasks]
+        self._pool.shutdown(wait=False)   # los hilos terminan solos al vaciar la cola
+
+    def get(self, key):
+        """Primera variante cargada de `key`, o None si todavía no está (o no existe)."""
+        variants = self._variants.get(key)
+        return variants[0] if variants else None
+
+    def variants(self, key):
+        return self._variants.get(key, ())
+
+    def ready(self):
+        return all(f.done() for f in self._futures)
+
+    def wait(self, timeout=None):
+        """Bloquea hasta terminar la carga (herramientas/tests; el juego no espera)."""
+        return futures_wait(self._futures, timeout).not_done == set()
+
+    # --- hilos del pool ---
+    def _cache_path(self, fname, path):
+        st = os.stat(path)
+        freq, fmt, channels = self._format
+        stem = os.path.splitext(fname)[0]
+        return os.path.join(self.cache_dir, f"{stem}@{st.st_size}.{int(st.st_mtime)}.{freq}.{fmt}.{channels}.pcm")
+
+    def _load(self, key, fname, path):
+        try:
+            cached = self._cache_path(fname, path) if self.cache_dir else None
+            snd = None
+            if cached and os.path.exists(cached):
+                try:
+                    with open(cached, "rb") as f:
+                        snd = pygame.mixer.Sound(buffer=f.read())   # ya en el formato del mixer: sin decodificar
+                    source = "cached"
+                except (OSError, pygame.error):
+                    snd = None
+            if snd is None:
+                snd = pygame.mixer.Sound(path)                       # decodifica + convierte al formato del mixer
+                source = "decoded"
+                if cached:
+                    self._store(cached, snd.get_raw())
+            snd.set_volume(SFX_VOLUME)
+        except Exception:
+            self._done("failed")
+            return
+        with self._lock:
+            self._loaded[fname] = snd
+            # se publica una lista nueva: el hilo del juego nunca ve una a medio armar
+            self._variants[key] = [self._loaded[f] for f in self.manifest[key] if f in self._loaded]
+        self._done(source)
+
+    def _store(self, cached, raw):
+        """Escribe la muestra cruda (temporal + rename) y borra las versiones viejas del mismo archivo."""
+        current = os.path.basename(cached)
+        prefix = current.split("@")[0] + "@"
+        try:
+            tmp = cached + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(raw)
+            os.replace(tmp, cached)
+            for name in os.listdir(self.cache_dir):
+                if name.startswith(prefix) and name != current:
+                    os.remove(os.path.join(self.cache_dir, name))
+        except OSError:
+            pass
+
+    def _load_music(self, path):
+        try:
+            pygame.mixer.music.load(path)
+            pygame.mixer.music.set_volume(MUSIC_VOLUME)
+            self.music_ready = True
+        except Exception:
+            self._done("failed")
+            return
+        self._done(None)
+
+    def _done(self, source):
+        with self._lock:
+            if source:
+                self.stats[source] += 1
+            self._remaining -= 1
+            if self._remaining == 0:
+                self.stats["ready_ms"] = (time.perf_counter() - self._t0) * 1000.0
+
+# sonido -> (prioridad, voces simultáneas, ms mínimos entre disparos)
+SFX_RULES = {
+    "hurt":        (100, 1, 0),     # la más alta: nunca se le roba la voz
+    "gameover":    (90, 1, 0),
+    "boss_warn":   (80, 1, 0),
+    "levelup":     (70, 1, 0),
+    "powerup":     (70, 1, 0),
+    "pause_in":    (60, 1, 0),
+    "pause_out":   (60, 1, 0),
+    "confirm":     (50, 1, 0),
+    "select":      (50, 1, 40),
+    "hit":         (40, 3, 35),
+    "shoot":       (30, 4, 0),      # ya lo limita el cooldown de disparo
+    "enemy_shoot": (20, 2, 60),
+}
+SFX_DEFAULT_RULE = (10, 1, 0)
+SFX_VOICES = 12   # canales del mixer reservados para efectos
+
+class VoiceAllocator:
+    """
+    Efectos sobre un pool fijo de voces (canales reservados del mixer). Los
+    disparos se encolan y se resuelven una vez por paso de lógica (flush): los
+    iguales del mismo paso se funden en uno y cada sonido respeta su
+    prioridad, tope de voces e intervalo mínimo (SFX_RULES). Sin voz libre se
+    roba la más vieja de menor prioridad, o se descarta: nunca se roba para un
+    sonido de igual o menor prioridad, así `hurt` no se corta.
+    """
+    STATS = ("triggered", "played", "coalesced", "rate_limited", "capped", "stolen", "dropped")
+
+    def __init__(self, assets, rules=SFX_RULES, voices=SFX_VOICES):
+        self.assets = assets
+        self.rules = rules
+        self.n_voices = voices
+        self.voices = []      # sin voces (headless / sin audio) trigger() no hace nada
+        self._key = []        # sonido de cada voz (None = libre)
+        self._prio = []
+        self._start = []
+        self._queued = {}     # sonidos disparados en este paso (orden de llegada)
+        self._last = {}       # sonido -> ms de su último inicio
+        self.stats = dict.fromkeys(self.STATS, 0)
+
+    def open(self):
+        """Reserva las voces (requiere el mixer iniciado)."""
+        pygame.mixer.set_reserved(self.n_voices)
+        self.voices = [pygame.mixer.Channel(i) for i in range(self.n_voices)]
+        self._key = [None] * self.n_voices
+        self._prio = [0] * self.n_voices
+        self._start = [0] * self.n_voices
+
+    def trigger(self, key):
+        if not self.voices:
+            return
+        self.stats["triggered"] += 1
+        if key in self._queued:
+            self.stats["coalesced"] += 1
+        else:
+            self._queued[key] = None
+
+    def flush(self):
+        """Arranca los sonidos del paso, de mayor a menor prioridad."""
+        if not self._queued:
+            return
+        now = get_ticks()
+        rules = self.rules
+        for key in sorted(self._queued, key=lambda k: -rules.get(k, SFX_DEFAULT_RULE)[0]):
+            self._start_voice(key, now)
+        self._queued.clear()
+
+    def _start_voice(self, key, now):
+        prio, cap, gap = self.rules.get(key, SFX_DEFAULT_RULE)
+        variants = self.assets.variants(key)
+        if not variants:   # todavía cargando: placeholder silencioso
+            return
+        last = self._last.get(key)
+        if last is not None and now - last < gap:
+            self.stats["rate_limited"] += 1
+            return
+        free = victim = None
+        same = 0
+        keys, prios, starts = self._key, self._prio, self._start
+        for i, ch in enumerate(self.voices):
+            k = keys[i]
+            if k is not None and not ch.get_busy():
+                k = keys[i] = None
+            if k is None:
+                if free is None:
+                    free = i
+            elif k == key:
+                same += 1
+            elif prios[i] < prio and (victim is None or (prios[i], starts[i]) < (prios[victim], starts[victim])):
+                victim = i
+        if same >= cap:
+            self.stats["capped"] += 1
+            return
+        if free is None:
+            if victim is None:
+                self.stats["dropped"] += 1
+                return
+            self.voices[victim].stop()
+            self.stats["stolen"] += 1
+            free = victim
+        self.voices[free].play(variants[0] if len(variants) == 1 else random.choice(variants))
+        keys[free], prios[free], starts[free] = key, prio, now
+        self._last[key] = now
+        self.stats["played"] += 1
 
 # ================================
 # CLASE GAME (loop, audio, perfiles)
 # ================================
 class Game:
-    def __init__(self):
-        self.profiles = ProfileManager()
-
-        # AUDIO
-        self.snd_shoots = []
-        self.snd_hit    = None
-        self.snd_hurt   = None
-        self.snd_power  = None
-        self.snd_enemy_shoot = None
-        self.snd_levelup = None
-        self.snd_boss_warn = None
-        self.snd_pause_in  = None
-        self.snd_pause_out = None
-        self.snd_select = None
-        self.snd_confirm = None
-        self.snd_gameover = None
-        self.music_ok   = False
-
-        self._shoot_rr = 0
-        self.ch_pool_shoot = []
-        self.ch_hit  = None
-        self.ch_hurt = None
-        self.ch_ui   = None
-        self.ch_enemy = None
-
-        def resolve_path(filename):
-            """Busca en assets/ y assets/sonidos/."""
-            p1 = os.path.join(ASSETS_DIR, filename)
-            p2 = os.path.join(ASSETS_DIR, "sonidos", filename)
-            if os.path.exists(p1): return p1
-            if os.path.exists(p2): return p2
-            return None
-
+    def __init__(self, headless=HEADLESS, dirty_rects=DIRTY_RECTS, display=DISPLAY_MODE,
+                 replay_dir=REPLAY_DIR, profiles=None):
+        t0 = time.perf_counter()
+        self.headless = headless   # sin render ni audio: la lógica corre a máxima velocidad
+        if not headless:
+            BOOT.display(display, headless=False)   # antes de crear Surfaces: así se convierten al formato de la ventana
+        self.replay_dir = replay_dir
+        self.record_replays = bool(replay_dir)
+        self.dirty_rects = dirty_rects
+        self.renderer = DirtyRenderer()
+        GC.install()
+        if MEMTRACE:
+            MEMORY.start()
+        # sin `profiles`: los del disco; headless (bench, simulate, bots), sólo en memoria
+        if profiles is None:
+            profiles = ProfileManager() if headless else ProfileManager(make_profile_store())
+        self.profiles = profiles
+
+        # AUDIO: los sonidos se cargan en segundo plano (AudioAssets) y suenan vía el VoiceAllocator
+        self.audio = AudioAssets()
+        self.sfx = VoiceAllocator(self.audio)
+        self.music_pending = False   # se pidió música antes de que terminara de cargarse
         try:
-            pygame.mixer.init()
+            if self.headless:
+                raise RuntimeError("audio deshabilitado en modo headless")
+            if not BOOT.audio(headless=False):
+                raise RuntimeError("sin dispositivo de audio")
             pygame.mixer.set_num_channels(32)
-            self.ch_pool_shoot = [pygame.mixer.Channel(i) for i in range(4)]
-            self.ch_hit  = pygame.mixer.Channel(10)
-            self.ch_hurt = pygame.mixer.Channel(11)
-            self.ch_ui   = pygame.mixer.Channel(12)
-            self.ch_enemy= pygame.mixer.Channel(13)
-
-            # --- Player shots (múltiples candidatos) ---
-            shoot_candidates = ["shoot.wav", "shoot1.wav", "shoot2.wav", "laser.wav"]
-            for name in shoot_candidates:
-                path = resolve_path(name)
-                if path:
-                    try:
-                        s = pygame.mixer.Sound(path)
-                        s.set_volume(SFX_VOLUME)
-                        self.snd_shoots.append(s)
-                    except Exception:
-                        pass
-
-            # --- Efectos varios ---
-            def load_one(fname):
-                p = resolve_path(fname)
-                if not p: return None
-                try:
-                    s = pygame.mixer.Sound(p)
-                    s.set_volume(SFX_VOLUME)
-                    return s
-                except Exception:
-                    return None
-
-            self.snd_hit        = load_one("hit.wav")
-            self.snd_hurt       = load_one("hurt.wav")
-            self.snd_power      = load_one("powerup.wav")
-            self.snd_enemy_shoot= load_one("enemy_shoot.wav")
-            self.snd_levelup    = load_one("levelup.wav")
-            self.snd_boss_warn  = load_one("boss_warn.wav")
-            self.snd_pause_in   = load_one("pause_in.wav")
-            self.snd_pause_out  = load_one("pause_out.wav")
-            self.snd_select     = load_one("select.wav")
-            self.snd_confirm    = load_one("confirm.wav")
-            self.snd_gameover   = load_one("gameover.wav")
-
-            # Música
-            mpath = resolve_path("bgm.mp3") or resolve_path("bgm.wav")
-            if mpath:
-                try:
-                    pygame.mixer.music.load(mpath)
-                    pygame.mixer.music.set_volume(MUSIC_VOLUME)
-                    self.music_ok = True
-                except Exception:
-                    self.music_ok = False
-
+            self.sfx.open()
+            self.audio.start()
         except Exception:
-            self.snd_shoots = []
-            self.snd_hit = self.snd_hurt = self.snd_power = None
-            self.snd_enemy_shoot = self.snd_levelup = self.snd_boss_warn = None
-            self.snd_pause_in = self.snd_pause_out = None
-            self.snd_select = self.snd_confirm = self.snd_gameover = None
-            self.music_ok = False
-            self.ch_pool_shoot = []
-            self.ch_hit = self.ch_hurt = self.ch_ui = self.ch_enemy = None
-            self._shoot_rr = 0
-
-        self.crt_overlay = build_crt_overlay()
+            self.sfx.voices = []
+
+        self.crt = make_crt()   # post-proceso CRT (ver CRT_MODES)
         self.crt_on = True
+        self.starfield = Starfield()   # una sola instancia para todos los estados
+        self.alpha = 1.0   # fracción del paso de lógica transcurrida al dibujar (interpolación, ver run)
         self.state = MenuState(self)
-
-    # ==== SFX helpers ====
-    def play_shoot(self):
-        if not self.snd_shoots or not self.ch_pool_shoot: return
-        ch = self.ch_pool_shoot[self._shoot_rr]
-        self._shoot_rr = (self._shoot_rr + 1) % len(self.ch_pool_shoot)
-        ch.play(random.choice(self.snd_shoots))
-    def play_hit(self):
-        if self.snd_hit and self.ch_hit: self.ch_hit.play(self.snd_hit)
-    def play_hurt(self):
-        if self.snd_hurt and self.ch_hurt: self.ch_hurt.play(self.snd_hurt)
-    def play_powerup(self):
-        if self.snd_power and self.ch_ui: self.ch_ui.play(self.snd_power)
-    def play_enemy_shoot(self):
-        if self.snd_enemy_shoot and self.ch_enemy: self.ch_enemy.play(self.snd_enemy_shoot)
-    def play_levelup(self):
-        if self.snd_levelup and self.ch_ui: self.ch_ui.play(self.snd_levelup)
-    def play_boss_warn(self):
-        if self.snd_boss_warn and self.ch_ui: self.ch_ui.play(self.snd_boss_warn)
-    def play_pause_in(self):
-        if self.snd_pause_in and self.ch_ui: self.ch_ui.play(self.snd_pause_in)
-    def play_pause_out(self):
-        if self.snd_pause_out and self.ch_ui: self.ch_ui.play(self.snd_pause_out)
-    def play_select(self):
-        if self.snd_select and self.ch_ui: self.ch_ui.play(self.snd_select)
-    def play_confirm(self):
-        if self.snd_confirm and self.ch_ui: self.ch_ui.play(self.snd_confirm)
-    def play_gameover(self):
-        if self.snd_gameover and self.ch_ui: self.ch_ui.play(self.snd_gameover)
+        BOOT.mark("game", t0)
+
+    # ==== SFX helpers (se agrupan por paso, ver VoiceAllocator) ====
+    def play_shoot(self): self.sfx.trigger("shoot")
+    def play_hit(self): self.sfx.trigger("hit")
+    def play_hurt(self): self.sfx.trigger("hurt")
+    def play_powerup(self): self.sfx.trigger("powerup")
+    def play_enemy_shoot(self): self.sfx.trigger("enemy_shoot")
+    def play_levelup(self): self.sfx.trigger("levelup")
+    def play_boss_warn(self): self.sfx.trigger("boss_warn")
+    def play_pause_in(self): self.sfx.trigger("pause_in")
+    def play_pause_out(self): self.sfx.trigger("pause_out")
+    def play_select(self): self.sfx.trigger("select")
+    def play_confirm(self): self.sfx.trigger("confirm")
+    def play_gameover(self): self.sfx.trigger("gameover")
 
     def change_state(self, new_state): self.state = new_state
+    def save_replay(self, replay):
+        if not self.replay_dir: return
+        try:
+            os.makedirs(self.replay_dir, exist_ok=True)
+            replay.save(os.path.join(self.replay_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{replay.seed:08x}.frrp"))
+        except (OSError, struct.error):   # un replay que no se puede guardar no corta el fin de partida
+            pass
     def play_music_loop(self):
-        if self.music_ok and not pygame.mixer.music.get_busy():
+        """Arranca la música en loop; si todavía se está cargando, queda pendiente (ver update)."""
+        if not self.audio.music_ready:
+            self.music_pending = True
+        elif not pygame.mixer.music.get_busy():
+            self.music_pending = False
             pygame.mixer.music.play(-1)
 
+    def toggle_music(self):
+        """Tecla M: corta la música (o su arranque pendiente) o la vuelve a poner."""
+        if self.music_pending:
+            self.music_pending = False
+        elif self.audio.music_ready and pygame.mixer.music.get_busy():
+            pygame.mixer.music.stop()
+        else:
+            self.play_music_loop()
+
+    def render(self, screen):
+        """Frame completo: estado + overlay CRT."""
+        self.state.render(screen)
+        if self.crt_on:
+            self.crt.apply(screen)
+
+    def present(self):
+        """Dibuja y envía el frame: por rects sucios si el estado lo soporta, si no flip()."""
+        window = pygame.display.get_surface()
+        if (self.dirty_rects and not PROFILER.overlay
+                and self.state.static_key() is not None):
+            with PROFILER.phase("render"):
+                self.renderer.present(self.state, window, self.crt if self.crt_on else None)
+        else:
+            with PROFILER.phase("render"):
+                self.render(window)
+                PROFILER.draw(window)
+            with PROFILER.phase("present"):
+                pygame.display.flip()
+            self.renderer.invalidate()
+        if not BOOT.first_frame_done:
+            BOOT.first_frame(self)
+
+    def handle_hotkeys(self, events):
+        """Teclas globales de diagnóstico (F3 overlay, F4 exportar trace, F5 monitor de memoria)."""
+        for event in events:
+            if event.type != pygame.KEYDOWN: continue
+            if event.key == PROFILE_HOTKEY:
+                PROFILER.toggle_overlay()
+            elif event.key == PROFILE_EXPORT_KEY and PROFILER.frames:
+                try:
+                    PROFILER.export_trace(os.path.join(BASE_DIR, f"trace-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+                except OSError:
+                    pass
+            elif event.key == MEMTRACE_HOTKEY:
+                if not MEMORY.enabled:
+                    MEMORY.start()
+                    continue
+                try:
+                    MEMORY.dump(os.path.join(BASE_DIR, f"memory-{time.strftime('%Y%m%d-%H%M%S')}.txt"), self)
+                except OSError:
+                    pass
+
+    def update(self, events=()):
+        """Un paso de lógica."""
+        with PROFILER.phase("handle_events"):
+            self.state.handle_events(events)
+        self.state.snapshot()
+        with PROFILER.phase("update"):
+            self.state.update()
+        self.sfx.flush()
+        if self.music_pending and self.audio.music_ready and isinstance(self.state, PlayState):
+            self.play_music_loop()
+
+    def step(self, events=()):
+        """Un paso de lógica (+ render si no es headless)."""
+        self.update(events)
+        if not self.headless:
+            self.present()
+
     def run(self):
+        """
+        Loop de paso fijo: el tiempo real se acumula y la lógica avanza en pasos
+        de SIM_DT_MS con un reloj simulado (timers y animaciones en tiempo de
+        juego). Un frame lento se compensa con hasta MAX_CATCHUP_STEPS pasos
+        (se pierden frames dibujados, no velocidad); más atraso se descarta.
+        El render interpola entre los dos últimos pasos y su ritmo (RENDER_FPS)
+        es independiente del de la simulación.
+        """
+        BOOT.display(headless=self.headless)   # la cola de eventos necesita el video (en headless, driver dummy)
+        clock = pygame.time.Clock()
+        sim_clock = FrameClock(SIM_DT_MS, get_ticks())
+        prev_clock = use_clock(sim_clock)
+        acc, last = 0.0, time.perf_counter()
+        pending = []   # eventos que llegaron en frames sin paso de lógica
         running = True
         while running:
-            events = pygame.event.get()
+            PROFILER.begin_frame()
+            MEMORY.begin_frame(self.state)
+            with PROFILER.phase("events"):
+                events = pygame.event.get()
             for event in events:
                 if event.type == pygame.QUIT: running = False
-            self.state.handle_events(events)
-            self.state.update()
-            self.state.render(screen)
-            pygame.display.flip()
-            clock.tick(FPS)
+            self.handle_hotkeys(events)
+            pending.extend(events)
+            now = time.perf_counter()
+            acc += (now - last) * 1000.0
+            last = now
+            if self.headless:
+                acc = SIM_DT_MS   # sin render: un paso por vuelta, a máxima velocidad
+            steps = 0
+            while acc >= SIM_DT_MS and steps < MAX_CATCHUP_STEPS:
+                self.update(pending)
+                pending = []
+                sim_clock.tick()
+                acc -= SIM_DT_MS
+                steps += 1
+            if acc >= SIM_DT_MS:
+                acc %= SIM_DT_MS
+            if not self.headless:
+                self.alpha = acc / SIM_DT_MS
+                self.present()
+                PROFILER.end_frame()   # la espera de clock.tick no cuenta como trabajo del frame
+                MEMORY.end_frame()
+                clock.tick(RENDER_FPS)
+            else:
+                PROFILER.end_frame()
+                MEMORY.end_frame()
+        use_clock(prev_clock)
+        self.profiles.close()
         pygame.quit()
         sys.exit()
 
+def simulate(frames, state=None, game=None, inputs=None, frame_ms=1000 / FPS):
+    """
+    Corre `frames` frames de lógica sin render con reloj simulado.
+    inputs: callable(frame_idx) -> set de teclas presionadas (opcional).
+    Devuelve el Game para inspeccionar el estado final.
+    """
+    clock_src = FrameClock(frame_ms)
+    keys = ScriptedInput()
+    prev_clock, prev_input = use_clock(clock_src), use_input(keys)
+    try:
+        game = game or Game(headless=True)
+        if state is None:
+            state = PlayState(game)
+        game.change_state(state)
+        for i in range(frames):
+            if inputs is not None:
+                keys.set(inputs(i))
+            game.step()
+            clock_src.tick()
+    finally:
+        use_clock(prev_clock); use_input(prev_input)
+    return game
+
+# ================================
+# REPLAYS: grabación y re-simulación
+# ================================
+REPLAY_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_a, pygame.K_d, pygame.K_SPACE)  # bit i = tecla i
+
+def _put_varint(buf, n):
+    while n >= 0x80:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+def _get_varint(data, pos):
+    n = shift = 0
+    while True:
+        b = data[pos]; pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+class Replay:
+    """
+    Partida grabada: seed y nivel inicial de la sesión, instante exacto del
+    reloj al empezar, elecciones de power-up y, por cada update de PlayState,
+    las teclas (bits de REPLAY_KEYS) y los ticks de reloj desde el update
+    anterior (>1 = pausa / pantalla de power-up). Los frames iguales seguidos
+    se guardan como un solo run (cantidad, bits, gap).
+    """
+    MAGIC = b"FRRP"
+    VERSION = 1
+    _HEADER = "<4sBIHddB"
+    _RESULT = "<iHhI"
+
+    def __init__(self, seed, level=1, start_ms=0.0, frame_ms=SIM_DT_MS):
+        self.seed = seed
+        self.level = level
+        self.start_ms = start_ms
+        self.frame_ms = frame_ms
+        self.choices = []
+        self.runs = []          # [cantidad, bits, gap]
+        self.frame_count = 0
+        self.result = None      # (score, level, lives, frames) al terminar
+        self._last_t = start_ms
+
+    @classmethod
+    def start(cls, seed, level=1):
+        src = clock_source()
+        return cls(seed, level, src.time_ms(), getattr(src, "frame_ms", SIM_DT_MS))
+
+    # --- grabación ---
+    def capture(self, keys):
+        t = clock_source().time_ms()
+        gap = round((t - self._last_t) / self.frame_ms)
+        self._last_t = t
+        bits = 0
+        for i, k in enumerate(REPLAY_KEYS):
+            if keys[k]: bits |= 1 << i
+        last = self.runs[-1] if self.runs else None
+        if last is not None and last[1] == bits and last[2] == gap:
+            last[0] += 1
+        else:
+            self.runs.append([1, bits, gap])
+        self.frame_count += 1
+
+    def choose(self, selection):
+        self.choices.append(selection)
+
+    def finish(self, play_state):
+        self.result = (play_state.score, play_state.level, play_state.lives, self.frame_count)
+
+    def frames(self):
+        """(bits, gap) por update grabado."""
+        for count, bits, gap in self.runs:
+            for _ in range(count):
+                yield bits, gap
+
+    def matches(self, play_state):
+        return self.result == (play_state.score, play_state.level, play_state.lives, self.frame_count)
+
+    # --- formato binario ---
+    def to_bytes(self):
+        buf = bytearray(struct.pack(self._HEADER, self.MAGIC, self.VERSION, self.seed, self.level,
+                                    self.start_ms, self.frame_ms, self.result is not None))
+        if self.result is not None:
+            buf += struct.pack(self._RESULT, *self.result)
+        _put_varint(buf, len(self.choices))
+        buf += bytes(self.choices)
+        _put_varint(buf, len(self.runs))
+        for count, bits, gap in self.runs:
+            _put_varint(buf, count)
+            buf.append(bits)
+            _put_varint(buf, gap)
+        return bytes(buf)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, seed, level, start_ms, frame_ms, has_result = struct.unpack_from(cls._HEADER, data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("replay inválido o de otra versión")
+        rep = cls(seed, level, start_ms, frame_ms)
+        pos = struct.calcsize(cls._HEADER)
+        if has_result:
+            rep.result = struct.unpack_from(cls._RESULT, data, pos)
+            pos += struct.calcsize(cls._RESULT)
+        n, pos = _get_varint(data, pos)
+        rep.choices = list(data[pos:pos + n]); pos += n
+        n, pos = _get_varint(data, pos)
+        for _ in range(n):
+            count, pos = _get_varint(data, pos)
+            bits = data[pos]; pos += 1
+            gap, pos = _get_varint(data, pos)
+            rep.runs.append([count, bits, gap])
+            rep.frame_count += count
+        return rep
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+def play_replay(replay, game=None):
+    """
+    Re-simula una partida grabada sin render (headless, a máxima velocidad) y
+    devuelve el PlayState final; replay.matches(ps) dice si se reprodujo igual.
+    Los perfiles quedan en memoria: re-simular no toca profiles.json.
+    """
+    clock_src = FrameClock(replay.frame_ms, replay.start_ms)
+    keys = ScriptedInput()
+    prev_clock, prev_input = use_clock(clock_src), use_input(keys)
+    try:
+        if game is None:
+            game = Game(headless=True, replay_dir="", profiles=ProfileManager())
+        ps = PlayState(game, seed=replay.seed, level=replay.level)
+        ps.replay = None
+        game.change_state(ps)
+        choices = iter(replay.choices)
+        choosing = False
+        for bits, gap in replay.frames():
+            for _ in range(gap):
+                clock_src.tick()
+            if choosing:   # la elección se aplicó en el mismo paso que el update siguiente
+                game.state.selection = next(choices)
+                game.state.apply_and_continue()
+                choosing = False
+            keys.set(k for i, k in enumerate(REPLAY_KEYS) if bits >> i & 1)
+            ps.update()
+            if game.state is not ps:
+                if not isinstance(game.state, PowerUpChoiceState):
+                    break
+                choosing = True
+    finally:
+        use_clock(prev_clock); use_input(prev_input)
+    return ps
+
 # ================================
 # PUNTO DE ENTRADA
 # ================================
+BOOT.times["import"] = (time.perf_counter() - _T_IMPORT) * 1000.0
+
 if __name__ == "__main__":
     Game().run()